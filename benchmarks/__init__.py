@@ -0,0 +1,12 @@
+"""Benchmarks for dkfileutils (not part of the installed package).
+
+   Run from the root of the repository::
+
+       python -m benchmarks                      # print timings
+       python -m benchmarks --save base.json     # store a baseline
+       python -m benchmarks --baseline base.json # compare with it
+
+   The benchmarks run on synthetic trees created by
+   :func:`benchmarks.synthetic.make_tree`, so the results only depend on
+   the code and the machine.
+"""
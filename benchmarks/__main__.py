@@ -0,0 +1,222 @@
+"""Time the public entry points of dkfileutils on a synthetic tree, and
+   compare the results with a stored baseline.
+"""
+from __future__ import print_function
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from dkfileutils import changed, pfind, which
+from dkfileutils.listfiles import list_files
+from dkfileutils.path import Path
+
+from .synthetic import make_tree
+
+#: the benchmarks, in the order they're run.  Each function takes the
+#: tree info and returns ``(items, bytes)`` processed.
+BENCHMARKS = []
+
+
+def benchmark(fn):
+    BENCHMARKS.append(fn)
+    return fn
+
+
+def _kept(tree):
+    if 'kept' not in tree:
+        tree['kept'] = [os.path.join(tree['root'], fname) for fname
+                        in list_files(tree['root'], digest=False)]
+        tree['kept_bytes'] = sum(os.path.getsize(f) for f in tree['kept'])
+    return tree['kept'], tree['kept_bytes']
+
+
+@benchmark
+def list_files_names(tree):
+    n = sum(1 for _ in list_files(tree['root'], digest=False))
+    return n, 0
+
+
+@benchmark
+def list_files_names_threaded(tree):
+    n = sum(1 for _ in list_files(tree['root'], digest=False, workers=8))
+    return n, 0
+
+
+@benchmark
+def list_files_digest(tree):
+    n = sum(1 for _ in list_files(tree['root'], digest=True))
+    return n, _kept(tree)[1]
+
+
+@benchmark
+def digest(tree):
+    changed.digest(tree['root'])
+    kept, nbytes = _kept(tree)
+    return len(kept), nbytes
+
+
+@benchmark
+def tree_digest(tree):
+    changed.tree_digest(tree['root'], processes=4)
+    kept, nbytes = _kept(tree)
+    return len(kept), nbytes
+
+
+@benchmark
+def changed_cold(tree):
+    cachefile = os.path.join(tree['root'], '.md5')
+    if os.path.exists(cachefile):
+        os.unlink(cachefile)
+    changed.changed(tree['root'])
+    kept, nbytes = _kept(tree)
+    return len(kept), nbytes
+
+
+@benchmark
+def changed_warm(tree):
+    changed.changed(tree['root'])   # nothing needs to be re-hashed
+    return len(_kept(tree)[0]), 0
+
+
+@benchmark
+def glob(tree):
+    return len(Path(tree['root']).glob('**/*.py')), 0
+
+
+@benchmark
+def path_iter(tree):
+    return sum(1 for _ in Path(tree['root'])), 0
+
+
+@benchmark
+def pfind_leaves(tree):
+    for leaf in tree['leaves']:
+        pfind.pfind(os.path.join(tree['root'], leaf), 'setup.cfg')
+    return len(tree['leaves']), 0
+
+
+@benchmark
+def pfind_many(tree):
+    pfind.pfind_many([os.path.join(tree['root'], leaf)
+                      for leaf in tree['leaves']], 'setup.cfg')
+    return len(tree['leaves']), 0
+
+
+@benchmark
+def which_lookups(tree):
+    n = 100
+    for _ in range(n // 2):
+        which.get_executable('sh')
+        which.get_executable('no-such-executable')
+    return n, 0
+
+
+def run(tree, repeat, names=None):
+    """Run the benchmarks and return ``{name: result}``, where `result` is
+       a dict with the best time (``seconds``), and the ``items/s`` and
+       ``MB/s`` of the best run.
+    """
+    res = {}
+    for fn in BENCHMARKS:
+        name = fn.__name__
+        if names and name not in names:
+            continue
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items, nbytes = fn(tree)
+            secs = max(time.perf_counter() - start, 1e-9)
+            if best is None or secs < best[0]:
+                best = secs, items, nbytes
+        secs, items, nbytes = best
+        res[name] = {
+            'seconds': secs,
+            'items/s': items / secs,
+            'MB/s': nbytes / secs / 1e6,
+        }
+    return res
+
+
+def compare(results, baseline, tolerance):
+    """Return the names of the benchmarks that are more than `tolerance`
+       (a fraction) slower than in `baseline`.
+    """
+    slower = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base and result['items/s'] < base['items/s'] * (1 - tolerance):
+            slower.append(name)
+    return slower
+
+
+def report(results, baseline=None):
+    for name, result in results.items():
+        line = "%-20s %10.4fs %12.0f items/s" % (
+            name, result['seconds'], result['items/s'])
+        if result['MB/s']:
+            line += " %8.1f MB/s" % result['MB/s']
+        base = (baseline or {}).get(name)
+        if base:
+            line += "  (%+.0f%%)" % (
+                100 * (result['items/s'] / base['items/s'] - 1))
+        print(line)
+
+
+def main():  # pragma: nocover
+    p = argparse.ArgumentParser(prog='python -m benchmarks',
+                                description=__doc__)
+    p.add_argument('--files', type=int, default=2000)
+    p.add_argument('--depth', type=int, default=4)
+    p.add_argument('--fanout', type=int, default=4)
+    p.add_argument('--min-size', type=int, default=100)
+    p.add_argument('--max-size', type=int, default=200000)
+    p.add_argument('--skipped', type=float, default=0.1,
+                   help="fraction of files hit by the skip rules")
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--only', nargs='*', help="benchmarks to run")
+    p.add_argument('--save', help="write the results to this json file")
+    p.add_argument('--baseline', help="compare with this json file")
+    p.add_argument('--tolerance', type=float, default=0.25,
+                   help="allowed slowdown compared to the baseline")
+    args = p.parse_args()
+
+    params = dict(files=args.files, depth=args.depth, fanout=args.fanout,
+                  sizes=[args.min_size, args.max_size],
+                  skipped=args.skipped, seed=args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            saved = json.load(fp)
+        if saved['params'] != params:
+            print("warning: the baseline used a different tree:",
+                  saved['params'])
+        baseline = saved['results']
+
+    root = tempfile.mkdtemp()
+    try:
+        tree = make_tree(root, **dict(params, sizes=tuple(params['sizes'])))
+        tree['root'] = root
+        print("tree: %(files)d files, %(dirs)d directories, %(bytes)d bytes"
+              % tree)
+        results = run(tree, args.repeat, args.only)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({'params': params, 'results': results}, fp, indent=4)
+    if baseline:
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print("slower than the baseline:", ', '.join(slower))
+            sys.exit(1)
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
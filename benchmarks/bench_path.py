@@ -0,0 +1,56 @@
+"""Measure how fast Path objects are created and joined.
+
+   Usage::
+
+       python benchmarks/bench_path.py [-n NUMBER]
+
+   Prints the number of operations per second for each case.
+"""
+from __future__ import print_function
+import argparse
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from dkfileutils.path import Path  # noqa: E402
+
+NAMES = ['file%d.txt' % i for i in range(1000)]
+
+
+def cases(tmpdir):
+    """Return a list of ``(name, fn, ops)`` where `fn` does `ops`
+       operations.
+    """
+    root = Path(tmpdir)
+    fnames = [os.path.join(tmpdir, name) for name in NAMES]
+    for fname in fnames[:200]:
+        open(fname, 'w').close()
+
+    return [
+        ('Path(str)', lambda: [Path(f) for f in fnames], len(fnames)),
+        ('Path(Path)', lambda: [Path(root) for _ in NAMES], len(NAMES)),
+        ('Path / name', lambda: [root / n for n in NAMES], len(NAMES)),
+        ('Path / "a/../b"', lambda: [root / 'a/../b' for _ in NAMES],
+         len(NAMES)),
+        ('Path.scandir()', lambda: list(root.scandir()), 200),
+        ('Path.files()', lambda: root.files(), 200),
+    ]
+
+
+def main():  # pragma: nocover
+    p = argparse.ArgumentParser()
+    p.add_argument('-n', '--number', type=int, default=50,
+                   help="number of repetitions of each case")
+    args = p.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, fn, ops in cases(tmpdir):
+            secs = min(timeit.repeat(fn, number=args.number, repeat=3))
+            print("%-20s %12.0f ops/s" % (name, ops * args.number / secs))
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
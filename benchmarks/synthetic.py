@@ -0,0 +1,75 @@
+"""Deterministic synthetic directory trees.
+"""
+import os
+import random
+
+from dkfileutils.listfiles import SKIPDIRS, SKIPEXTS
+
+#: file extensions of the files that are not skipped.
+EXTENSIONS = ('.py', '.js', '.css', '.html', '.json')
+
+
+def _size(rnd, sizes):
+    """Return a size in `sizes` = ``(min, max)``, skewed towards `min`
+       (many small files and a few large ones).
+    """
+    lo, hi = sizes
+    if hi <= lo:
+        return lo
+    return int(lo + (hi - lo) * rnd.random() ** 4)
+
+
+def _dirs(depth, fanout):
+    """Return the relative names of the directories of a tree with the
+       given `depth` and `fanout` (including the root ``''``).
+    """
+    res = ['']
+    level = ['']
+    for _ in range(depth):
+        level = [os.path.join(d, 'd%d' % i) for d in level
+                 for i in range(fanout)]
+        res += level
+    return res
+
+
+def make_tree(root, files=1000, depth=3, fanout=4, sizes=(100, 100000),
+              skipped=0.1, seed=0):
+    """Create a tree of `files` files below `root`.  The files are spread
+       over the directories of a tree of `depth` levels where every
+       directory has `fanout` subdirectories, and their sizes are between
+       ``sizes[0]`` and ``sizes[1]`` bytes.  About `skipped` of the files
+       are ignored by the default skip rules of
+       :func:`~dkfileutils.listfiles.list_files` (half of them in skipped
+       directories, half with skipped extensions).
+
+       The same arguments always create the same tree.  Returns a dict
+       with the number of ``files``, ``bytes``, and ``dirs``, and the
+       relative names of the ``leaves`` (the deepest directories).
+    """
+    rnd = random.Random(seed)
+    dirs = _dirs(depth, fanout)
+    for d in dirs:
+        os.makedirs(os.path.join(root, d), exist_ok=True)
+    leaves = [d for d in dirs if d.count(os.sep) + bool(d) == depth]
+
+    skipdirs = [d for d in SKIPDIRS if not d.startswith('.')]
+    skipexts = [e for e in SKIPEXTS if e.startswith('.')]
+    total = 0
+    for i in range(files):
+        d = rnd.choice(dirs)
+        name = 'f%d' % i
+        r = rnd.random()
+        if r < skipped / 2:
+            d = os.path.join(d, rnd.choice(skipdirs))
+            os.makedirs(os.path.join(root, d), exist_ok=True)
+            name += rnd.choice(EXTENSIONS)
+        elif r < skipped:
+            name += rnd.choice(skipexts)
+        else:
+            name += rnd.choice(EXTENSIONS)
+        size = _size(rnd, sizes)
+        with open(os.path.join(root, d, name), 'wb') as fp:
+            fp.write(rnd.getrandbits(8 * size).to_bytes(size, 'little')
+                     if size else b'')
+        total += size
+    return dict(files=files, bytes=total, dirs=len(dirs), leaves=leaves)
@@ -1,3 +1,5 @@
 """dkfileutils - simple, common file utilities.
 """
 __version__ = "1.4.7"
+
+from .statcache import fscache  # noqa: E402,F401
@@ -1,65 +1,334 @@
 """Check if contents of directory has changed.
 """
 import argparse
+import functools
 import os
-import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from .filehash import (
+    ALGORITHM, CHUNKSIZE, RANGESIZE, combine_ranges, file_digest,
+    file_ranges, hash_ranges, new_hasher, threaded_map, update_from_files
+)
+from .globber import iter_matches
 from .listfiles import list_files
+from .manifest import Changes, FileRecord, Manifest
 from .path import Path
+from .profiling import add_profile_argument, profile_env, profiled
+from .stats import Stats, phase
+from .watch import Watcher
 
 
-def digest(dirname, glob=None):
-    """Returns the md5 digest of all interesting files (or glob) in `dirname`.
+def _relpaths(root, glob=None, stats=None, workers=None):
+    """Return the relative names of the files that are measured by
+       :func:`changed`.
     """
-    md5 = hashlib.md5()
-    if glob is None:
-        fnames = [fname for _, fname in list_files(Path(dirname))]
-        for fname in sorted(fnames):
-            fname = os.path.join(dirname, fname)
-            md5.update(open(fname, 'rb').read())
-    else:
-        fnames = Path(dirname).glob(glob)
-        for fname in sorted(fnames):
-            md5.update(fname.open('rb').read())
-    return md5.hexdigest()
-
-
-def changed(dirname, filename='.md5', args=None, glob=None) -> bool:
+    with phase(stats, 'walk'):
+        if glob is None:
+            return list(list_files(root, digest=False, workers=workers,
+                                   stats=stats))
+        return [relpath for _fname, relpath, _
+                in iter_matches(root, [glob], stats=stats, workers=workers)]
+
+
+def _batches(fnames, sizes, rangesize):
+    """Split the files into lists of ``(fname, offset, length)`` ranges of
+       about `rangesize` bytes in total (many small files are hashed by one
+       task, a large file by several).
+    """
+    batch = []
+    total = 0
+    for fname, size in zip(fnames, sizes):
+        for offset, length in file_ranges(size, rangesize):
+            batch.append((fname, offset, length))
+            total += length
+            if total >= rangesize:
+                yield batch
+                batch = []
+                total = 0
+    if batch:
+        yield batch
+
+
+@profile_env
+def tree_digest(dirname, glob=None, processes=None, rangesize=RANGESIZE,
+                chunksize=CHUNKSIZE, algorithm=ALGORITHM, workers=None,
+                stats=None):
+    """Returns the tree digest of all interesting files (or glob) in
+       `dirname`, hashing in a pool of `processes` worker processes (for
+       CPU bound hashing of very large trees).
+
+       Every file is split into ranges of `rangesize` bytes that are hashed
+       separately, the digest of a file is the hash of its size and the
+       digests of its ranges (:func:`~dkfileutils.filehash.combine_ranges`),
+       and the tree digest is the hash of the relative names and digests of
+       all files, in sorted order.  The result depends on `rangesize` and
+       `algorithm`, but not on the number of processes (or `workers`, the
+       number of threads used for listing directories).
+    """
+    root = Path(dirname)
+    relpaths = sorted(_relpaths(root, glob, stats, workers))
+    fnames = [os.path.join(root, relpath) for relpath in relpaths]
+    sizes = [os.path.getsize(fname) for fname in fnames]
+    batches = list(_batches(fnames, sizes, rangesize))
+    fn = functools.partial(hash_ranges, chunksize=chunksize,
+                           algorithm=algorithm)
+
+    with phase(stats, 'hash'):
+        if processes is None or processes <= 1 or len(batches) <= 1:
+            results = map(fn, batches)
+            digests = [d for res in results for d in res]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                digests = [d for res in executor.map(fn, batches)
+                           for d in res]
+    if stats is not None:
+        stats.add(stat_calls=len(fnames),
+                  files_opened=sum(1 for size in sizes if size),
+                  bytes_hashed=sum(sizes))
+
+    hasher = new_hasher(algorithm)
+    pos = 0
+    for relpath, size in zip(relpaths, sizes):
+        n = len(file_ranges(size, rangesize))
+        hasher.update(relpath.encode('utf-8', 'surrogateescape') + b'\0')
+        hasher.update(combine_ranges(size, digests[pos:pos + n], algorithm))
+        pos += n
+    return hasher.hexdigest()
+
+
+@profile_env
+def digest(dirname, glob=None, chunksize=CHUNKSIZE, workers=None,
+           algorithm=ALGORITHM, merkle=False, stats=None, processes=None):
+    """Returns the digest of all interesting files (or glob) in `dirname`,
+       using the hash `algorithm` (md5 by default).
+
+       Files are read ``chunksize`` bytes at a time.  With `workers`,
+       directories are listed and files are read ahead in pools of threads
+       (the digest is the same).
+
+       With `merkle`, the result is instead the root hash of a Merkle tree
+       where each directory's hash is computed from its children's names and
+       hashes (see :meth:`dkfileutils.manifest.Manifest.merkle`).
+
+       With `processes`, files are hashed in a pool of processes and the
+       result is the :func:`tree_digest` (which is the same for any number
+       of processes, but differs from the default digest).
+
+       The work done is counted in `stats` (a
+       :class:`~dkfileutils.stats.Stats`) if given.
+    """
+    if processes is not None:
+        return tree_digest(dirname, glob, processes, chunksize=chunksize,
+                           algorithm=algorithm, workers=workers, stats=stats)
+    if merkle:
+        root = Path(dirname)
+        manifest = Manifest.scan(root, _relpaths(root, glob, stats, workers),
+                                 chunksize=chunksize, workers=workers,
+                                 algorithm=algorithm, stats=stats)
+        return manifest.merkle()
+
+    hasher = new_hasher(algorithm)
+    with phase(stats, 'walk'):
+        if glob is None:
+            fnames = list_files(Path(dirname), digest=False,
+                                workers=workers, stats=stats)
+            fnames = [os.path.join(dirname, fname)
+                      for fname in sorted(fnames)]
+        else:
+            fnames = sorted(Path(dirname).iglob(glob, stats, workers))
+    with phase(stats, 'hash'):
+        update_from_files(hasher, fnames, chunksize, workers, stats)
+    return hasher.hexdigest()
+
+
+def _rescan(root, filename, glob, workers, algorithm, stats=None):
+    """Scan `root` and update the manifest stored in `filename`.
+
+       Returns ``(previous, current)``, where `previous` is None if there
+       was no usable manifest (missing, or using a different algorithm).
+    """
+    cachefile = root / filename
+    previous = Manifest.read(cachefile)
+    if previous is not None and previous.algorithm != algorithm:
+        previous = None
+    relpaths = _relpaths(root, glob, stats, workers)
+    current = Manifest.scan(root, relpaths, previous, workers=workers,
+                            algorithm=algorithm, stats=stats)
+    with phase(stats, 'merkle'):
+        current.merkle(previous)
+    if previous is None or current.hashed or current != previous:
+        with phase(stats, 'write'):
+            current.write(cachefile)
+    return previous, current
+
+
+@profile_env
+def changed(dirname, filename='.md5', args=None, glob=None,
+            workers=None, algorithm=ALGORITHM, stats=None) -> bool:
     """Has `glob` changed in `dirname`
 
+       The file `filename` stores a manifest of the size, mtime, inode and
+       digest of every file, so only files whose stat information changed
+       since the last call are re-hashed.  The hash `algorithm` is recorded
+       in the manifest, and changing it counts as a change.
+
+       The manifest also stores the Merkle hash of every directory, and
+       directories without modified files re-use their stored hash.
+
        Args:
            dirname: directory to measure
-           filename: filename to store checksum
+           filename: filename to store the manifest
+           workers: number of threads used for hashing
+           algorithm: hash algorithm (any name accepted by hashlib.new)
+           stats: a :class:`~dkfileutils.stats.Stats` that counts the
+               work done
     """
     root = Path(dirname)
     if not root.exists():
         # if dirname doesn't exist it is changed (by definition)
         return True
 
-    cachefile = root / filename
-    current_digest = cachefile.open().read() if cachefile.exists() else ""
-
-    _digest = digest(dirname, glob=glob)
+    previous, current = _rescan(root, filename, glob, workers, algorithm,
+                                stats)
+    _digest = current.aggregate()
     if args and args.verbose:  # pragma: nocover
-        print("md5:", _digest)
-    has_changed = current_digest != _digest
+        print(algorithm + ":", _digest, "(rehashed %d files)" % current.hashed)
+    return previous is None or previous.aggregate() != _digest
+
 
-    if has_changed:
-        with open(os.path.join(dirname, filename), 'w') as fp:
-            fp.write(_digest)
+@profile_env
+def changes(dirname, filename='.md5', glob=None, workers=None,
+            algorithm=ALGORITHM, stats=None) -> Changes:
+    """Return the files in `dirname` (matching `glob`) that were added,
+       removed, or modified since the last call, as a
+       :class:`~dkfileutils.manifest.Changes` of relative file names.
 
-    return has_changed
+       This uses (and updates) the same manifest as :func:`changed`.  If
+       there is no previous manifest, all files are reported as added.
+    """
+    root = Path(dirname)
+    if not root.exists():
+        return Changes([], [], [])
+
+    previous, current = _rescan(root, filename, glob, workers, algorithm,
+                                stats)
+    if previous is None:
+        return Changes(sorted(current.files), [], [])
+    return previous.changes(current)
+
+
+def _glob_filename(filename, glob):
+    """The name of the manifest file used for `glob`.
+    """
+    if glob is not None:
+        filename += '.glob-' + ''.join(ch.lower()
+                                       for ch in glob if ch.isalpha())
+    return filename
+
+
+@profile_env
+def changed_many(dirname, globs, filename='.md5', workers=None,
+                 algorithm=ALGORITHM, chunksize=CHUNKSIZE) -> dict:
+    """Check several globs for changes in a single traversal of `dirname`.
+
+       `globs` is a dict ``{name: glob}``, and the result is a dict
+       ``{name: has_changed}``.  Each glob uses the same manifest file as
+       ``Directory(dirname).changed(filename, glob=glob)``.  Every file is
+       stat'ed once, and hashed at most once, no matter how many globs it
+       matches.
+    """
+    root = Path(dirname)
+    if not root.exists():
+        return {name: True for name in globs}
+
+    names = list(globs)
+    cachefiles = {}
+    for name in names:
+        cachefile = root / _glob_filename(filename, globs[name])
+        for other in names[:names.index(name)]:
+            if cachefiles[other] == cachefile and globs[other] != globs[name]:
+                raise ValueError("globs %r and %r would use the same file: %s"
+                                 % (globs[other], globs[name], cachefile))
+        cachefiles[name] = cachefile
+
+    previous = {}
+    for name in names:
+        manifest = Manifest.read(cachefiles[name])
+        if manifest is not None and manifest.algorithm == algorithm:
+            previous[name] = manifest
+    current = {name: Manifest(algorithm=algorithm) for name in names}
+
+    def record(match):
+        relpath, matching = match
+        fname = os.path.join(root, relpath)
+        st = os.stat(fname)
+        digest = None
+        for name in matching:
+            if name in previous:
+                digest = previous[name].lookup(relpath, st)
+                if digest is not None:
+                    break
+        hashed = digest is None
+        if hashed:
+            digest = file_digest(fname, chunksize, algorithm)
+        rec = FileRecord(st.st_size, st.st_mtime_ns, st.st_ino, digest)
+        return relpath, matching, rec, hashed
+
+    matches = ((relpath, [names[i] for i in indices])
+               for _fname, relpath, indices
+               in iter_matches(root, [globs[name] for name in names],
+                               workers=workers))
+    for relpath, matching, rec, hashed in threaded_map(record, matches,
+                                                       workers):
+        for name in matching:
+            current[name].files[relpath] = rec
+            current[name].hashed += hashed
+
+    res = {}
+    for name in names:
+        prev = previous.get(name)
+        cur = current[name]
+        cur.merkle(prev)
+        if prev is None or cur.hashed or cur != prev:
+            cur.write(cachefiles[name])
+        res[name] = prev is None or prev.aggregate() != cur.aggregate()
+    return res
 
 
 class Directory(Path):
     """A path that is a directory.
     """
-    def changed(self, filename='.md5', glob=None) -> bool:
+    def changed(self, filename='.md5', glob=None, workers=None,
+                algorithm=ALGORITHM, stats=None) -> bool:
         """Are any of the files matched by ``glob`` changed?
         """
-        if glob is not None:
-            filename += '.glob-' + ''.join(ch.lower()
-                                           for ch in glob if ch.isalpha())
-        return changed(self, filename, glob=glob)
+        filename = _glob_filename(filename, glob)
+        return changed(self, filename, glob=glob, workers=workers,
+                       algorithm=algorithm, stats=stats)
+
+    def changes(self, filename='.md5', glob=None, workers=None,
+                algorithm=ALGORITHM, stats=None) -> Changes:
+        """Which of the files matched by ``glob`` were added, removed, or
+           modified?
+        """
+        filename = _glob_filename(filename, glob)
+        return changes(self, filename, glob=glob, workers=workers,
+                       algorithm=algorithm, stats=stats)
+
+    def changed_many(self, globs, filename='.md5', workers=None,
+                     algorithm=ALGORITHM) -> dict:
+        """Which of the ``{name: glob}`` in `globs` have changed?  The tree
+           is only traversed once (see :func:`changed_many`).
+        """
+        return changed_many(self, globs, filename, workers=workers,
+                            algorithm=algorithm)
+
+    def watch(self, glob=None, **kw) -> Watcher:
+        """Return a :class:`~dkfileutils.watch.Watcher` that yields batches
+           of changes to the files in this directory (Linux only).  The
+           files are filtered by the same rules as
+           :func:`~dkfileutils.listfiles.list_files`, or by ``glob``.
+        """
+        return Watcher(self, glob=glob, **kw)
 
 
 def main():  # pragma: nocover
@@ -74,10 +343,28 @@ def main():  # pragma: nocover
         '--verbose', '-v', action='store_true',
         help="increase verbosity"
     )
+    p.add_argument(
+        '--jobs', '-j', type=int, default=None,
+        help="number of threads used for hashing"
+    )
+    p.add_argument(
+        '--algorithm', '-a', default=ALGORITHM,
+        help="hash algorithm (e.g. md5, sha1, sha256, blake2b)"
+    )
+    p.add_argument(
+        '--stats', action='store_true',
+        help="print i/o and timing statistics to stderr"
+    )
+    add_profile_argument(p)
     args = p.parse_args()
 
     import sys
-    _changed = changed(sys.argv[1], args=args)
+    stats = Stats() if args.stats else None
+    with profiled(args.profile):
+        _changed = changed(args.directory, args=args, workers=args.jobs,
+                           algorithm=args.algorithm, stats=stats)
+    if stats is not None:
+        print(stats, file=sys.stderr)
     sys.exit(_changed)
 
 
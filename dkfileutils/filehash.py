@@ -0,0 +1,188 @@
+"""Hash file contents in fixed size chunks.
+
+   The functions in this module never read more than ``chunksize`` bytes of
+   a file into memory at a time, so memory usage stays flat regardless of
+   the size of the files being hashed.
+"""
+import collections
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+#: default number of bytes read (and hashed) per chunk.
+CHUNKSIZE = 1024 * 1024
+
+#: default hash algorithm.
+ALGORITHM = 'md5'
+
+#: size of the byte ranges that files are split into by the tree digest
+#: (see :func:`file_ranges`).
+RANGESIZE = 64 * 1024 * 1024
+
+
+def new_hasher(algorithm=ALGORITHM):
+    """Return a new hash object for `algorithm` (any name accepted by
+       :func:`hashlib.new`, e.g. ``'md5'``, ``'sha1'``, ``'sha256'``,
+       ``'blake2b'``).
+    """
+    hasher = hashlib.new(algorithm)
+    if not hasher.digest_size:
+        # shake_128/shake_256 need a length argument to hexdigest()
+        raise ValueError(
+            "variable length hash algorithms are not supported: %r" % algorithm
+        )
+    return hasher
+
+
+def _update_from_fp(hasher, fp, chunksize):
+    """Hash the rest of `fp`, and return the number of bytes read.
+    """
+    # most files are smaller than a chunk, and are read with a single
+    # read() of the file size (+1 to notice if it has grown), instead of
+    # allocating a chunk sized buffer.
+    want = min(chunksize, os.fstat(fp.fileno()).st_size - fp.tell() + 1)
+    data = fp.read(want)
+    hasher.update(data)
+    total = len(data)
+    if total < want:
+        return total
+    buf = bytearray(chunksize)
+    view = memoryview(buf)
+    while True:
+        n = fp.readinto(buf)
+        if not n:
+            break
+        hasher.update(view[:n])
+        total += n
+    return total
+
+
+def update_from_file(hasher, fname, chunksize=CHUNKSIZE, stats=None):
+    """Feed the contents of `fname` to `hasher` (a :mod:`hashlib` object),
+       ``chunksize`` bytes at a time.  Returns `hasher`.
+
+       The file and the bytes read are counted in `stats` (a
+       :class:`~dkfileutils.stats.Stats`) if given.
+    """
+    with open(fname, 'rb', buffering=0) as fp:
+        n = _update_from_fp(hasher, fp, chunksize)
+    if stats is not None:
+        stats.add(files_opened=1, bytes_hashed=n)
+    return hasher
+
+
+def file_digest(fname, chunksize=CHUNKSIZE, algorithm=ALGORITHM, stats=None):
+    """Return the hexdigest of the contents of `fname`.
+    """
+    hasher = new_hasher(algorithm)
+    return update_from_file(hasher, fname, chunksize, stats).hexdigest()
+
+
+def threaded_map(fn, iterable, workers=None):
+    """Like ``map(fn, iterable)``, but runs `fn` in a pool of `workers`
+       threads.  Results are yielded in the order of `iterable`, which is
+       consumed lazily (at most a few items per worker are in flight).
+    """
+    if not workers or workers <= 1:
+        yield from map(fn, iterable)
+        return
+    pending = collections.deque()
+    window = 4 * workers
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def _read_head(fname, chunksize):
+    """Read the first chunk of `fname`.  Returns the data and the file
+       object if there is more to read (otherwise the file is closed and
+       None is returned in its place).
+    """
+    fp = open(fname, 'rb')
+    data = fp.read(chunksize)
+    if len(data) < chunksize:
+        fp.close()
+        return data, None
+    return data, fp
+
+
+def update_from_files(hasher, fnames, chunksize=CHUNKSIZE, workers=None,
+                      stats=None):
+    """Feed the concatenated contents of all `fnames` to `hasher`.
+
+       With `workers`, the first chunk of upcoming files is read in a pool
+       of threads while the current file is being hashed, so i/o latency
+       overlaps with hashing.  The result is identical.
+    """
+    if not workers or workers <= 1:
+        for fname in fnames:
+            update_from_file(hasher, fname, chunksize, stats)
+        return hasher
+
+    def read_head(fname):
+        return _read_head(fname, chunksize)
+
+    for data, fp in threaded_map(read_head, fnames, workers):
+        hasher.update(data)
+        n = len(data)
+        if fp is not None:
+            with fp:
+                n += _update_from_fp(hasher, fp, chunksize)
+        if stats is not None:
+            stats.add(files_opened=1, bytes_hashed=n)
+    return hasher
+
+
+def file_ranges(size, rangesize=RANGESIZE):
+    """Return the ``(offset, length)`` of the ranges a file of `size` bytes
+       is split into (none for an empty file).
+    """
+    return [(offset, min(rangesize, size - offset))
+            for offset in range(0, size, rangesize)]
+
+
+def range_digest(fname, offset, length, chunksize=CHUNKSIZE,
+                 algorithm=ALGORITHM):
+    """Return the (binary) digest of the `length` bytes of `fname` starting
+       at `offset`.
+    """
+    hasher = new_hasher(algorithm)
+    buf = bytearray(max(1, min(chunksize, length)))
+    view = memoryview(buf)
+    with open(fname, 'rb', buffering=0) as fp:
+        fp.seek(offset)
+        while length > 0:
+            n = fp.readinto(view[:min(length, len(buf))])
+            if not n:
+                break
+            hasher.update(view[:n])
+            length -= n
+    return hasher.digest()
+
+
+def hash_ranges(ranges, chunksize=CHUNKSIZE, algorithm=ALGORITHM):
+    """Return the digests of `ranges`, a list of ``(fname, offset, length)``.
+       (Used in worker processes, so it must be a module level function.)
+    """
+    return [range_digest(fname, offset, length, chunksize, algorithm)
+            for fname, offset, length in ranges]
+
+
+def combine_ranges(size, digests, algorithm=ALGORITHM):
+    """Return the (binary) digest of a file of `size` bytes from the
+       `digests` of its ranges (see :func:`file_ranges`).
+    """
+    hasher = new_hasher(algorithm)
+    hasher.update(b'file %d\0' % size)
+    for digest in digests:
+        hasher.update(digest)
+    return hasher.digest()
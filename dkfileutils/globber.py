@@ -0,0 +1,381 @@
+"""Extended glob patterns (``**/*.less``) that are matched while walking a
+   directory tree, so only directories that can contain matches are
+   entered.
+
+   ``*`` and ``?`` match within one path segment, ``[..]`` is a character
+   class (``[!..]`` negates it), ``**/`` matches zero or more
+   directories, and a trailing ``/**`` matches everything below a
+   directory.  Files and directories whose names start with ``.`` are
+   never matched or entered.
+
+   A list of patterns is matched in order, similar to node.js' minimatch:
+   a file is included if the last pattern that matches it is an include
+   pattern, and patterns starting with ``!`` exclude files.
+
+   On case-insensitive platforms (Windows), patterns and names are
+   matched in lower case, like the normcased paths of
+   :class:`~dkfileutils.path.Path`.
+"""
+import functools
+import os
+import re
+import stat
+
+from .walker import walk
+
+#: marker for a ``**`` segment (matches zero or more directories).
+GLOBSTAR = None
+
+#: the state of patterns that must be matched against the full relative
+#: path (i.e. all directories are entered).
+ANYWHERE = frozenset([-1])
+_EMPTY = frozenset()
+
+#: match names case-insensitively (where :func:`os.path.normcase` folds
+#: case).
+CASEFOLD = os.path.normcase('A') == 'a'
+
+
+def _normalize(pat):
+    """A trailing ``**`` matches everything below a directory.
+    """
+    if pat == '**' or pat.endswith('/**'):
+        return pat + '/*'
+    return pat
+
+
+def translate(pat):
+    """Translate the glob pattern `pat` to a regular expression (without
+       anchors), matched against ``/``-separated relative paths.
+    """
+    pat = _normalize(pat)
+    r = ""
+    i = 0
+    while i < len(pat):
+        if pat[i:i + 3] == '**/':
+            r += "(?:.*/)?"
+            i += 3
+        elif pat[i] == '*':
+            r += "[^/]*"
+            i += 1
+        elif pat[i] == '?':
+            r += "[^/]"
+            i += 1
+        elif pat[i] == '[' and ']' in pat[i + 2:]:
+            j = pat.index(']', i + 2)
+            chars = pat[i + 1:j].replace('\\', '\\\\')
+            if chars.startswith('!'):
+                chars = '^' + chars[1:]
+            r += '[' + chars + ']'
+            i = j + 1
+        else:
+            r += re.escape(pat[i])
+            i += 1
+    return r
+
+
+def _compile_segment(seg):
+    """Return `seg` if it is a literal name, otherwise a function that
+       matches a name against the wildcard segment.
+    """
+    if not any(ch in seg for ch in '*?['):
+        return seg
+    return re.compile('(?s)' + translate(seg) + r'\Z').match
+
+
+class GlobPattern:
+    """A compiled glob pattern.  A leading ``!`` negates the entire
+       pattern (similar to node.js' minimatch).
+    """
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.negate = pattern.startswith('!')
+        pat = _normalize(pattern[1:] if self.negate else pattern)
+        if CASEFOLD:
+            pat = pat.lower()
+        self._match = re.compile('(?s)' + translate(pat) + r'\Z').match
+
+        parts = pat.split('/')
+        self._anyname = parts[-1] == '*'  # the last segment matches any name
+        last = len(parts) - 1
+        if any('**' in seg and seg != '**'
+               for seg in parts[:-1]):  # e.g. ``a**/b``
+            #: the compiled path segments, or None if the pattern can only
+            #: be matched against the full relative path.
+            self.segments = None
+        else:
+            self.segments = [
+                GLOBSTAR if seg == '**' and i < last else _compile_segment(seg)
+                for i, seg in enumerate(parts)
+            ]
+
+    def __repr__(self):
+        return 'GlobPattern(%r)' % self.pattern
+
+    def match(self, relpath):
+        """Does `relpath` (using ``/`` as separator) match the pattern?
+        """
+        if CASEFOLD:
+            relpath = relpath.lower()
+        return (self._match(relpath) is None) == self.negate
+
+    def start(self):
+        """The set of states before any directory has been entered.
+        """
+        if self.negate or self.segments is None:
+            return ANYWHERE
+        return self._closure({0})
+
+    def _closure(self, states):
+        res = set()
+        segments = self.segments
+        for i in states:
+            while segments[i] is GLOBSTAR:
+                res.add(i)
+                i += 1
+            res.add(i)
+        return frozenset(res)
+
+    def step(self, states, name, relpath, is_dir):
+        """Match the directory entry `name` (with relative path `relpath`)
+           against `states`.  Returns ``(matched, next_states)``, where
+           `matched` is True if `name` matches the last segment, and
+           `next_states` is the set of states in the directory `name`
+           (empty if it can't contain matches).
+        """
+        if states is ANYWHERE:
+            if is_dir:
+                return False, ANYWHERE
+            return self.match(relpath), _EMPTY
+        segments = self.segments
+        last = len(segments) - 1
+        matched = False
+        nxt = set()
+        for i in states:
+            seg = segments[i]
+            if seg is GLOBSTAR:
+                if is_dir:
+                    nxt.add(i)
+            elif seg == name if seg.__class__ is str else seg(name):
+                if i == last:
+                    matched = True
+                elif is_dir:
+                    nxt.add(i + 1)
+        return matched, self._closure(nxt) if nxt else _EMPTY
+
+    def universal(self, states):
+        """Will every file below a directory with `states` match?
+        """
+        if not self._anyname or states is ANYWHERE:
+            return False
+        last = len(self.segments) - 1
+        return any(self.segments[i] is GLOBSTAR and i + 1 == last
+                   for i in states)
+
+    def literal(self, states):
+        """Return the name that all of `states` require, if `states` is a
+           single literal segment (so the directory doesn't need to be
+           listed), otherwise None.
+        """
+        if len(states) == 1 and states is not ANYWHERE:
+            for i in states:
+                seg = self.segments[i]
+                if seg.__class__ is str:
+                    return seg
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def compile_glob(pattern):
+    """Return the (cached) :class:`GlobPattern` for `pattern`.
+    """
+    return GlobPattern(pattern)
+
+
+class GlobSet:
+    """An ordered list of include and exclude (``!``) patterns.  A file
+       matches if the last pattern that matches it is an include pattern.
+       If the first pattern is an exclude pattern, all files are included
+       to begin with.
+    """
+    def __init__(self, patterns):
+        patterns = list(patterns)
+        if patterns and patterns[0].startswith('!'):
+            patterns.insert(0, '**')
+        self.patterns = patterns
+        #: the patterns without their leading ``!``
+        self.positive = [p[1:] if p.startswith('!') else p for p in patterns]
+        self.exclude = [p.startswith('!') for p in patterns]
+        self._pats = [compile_glob(p) for p in self.positive]
+
+    def __repr__(self):
+        return 'GlobSet(%r)' % self.patterns
+
+    def match(self, relpath):
+        """Does `relpath` match the set of patterns?
+        """
+        for pat, exclude in zip(reversed(self._pats), reversed(self.exclude)):
+            if pat.match(relpath):
+                return not exclude
+        return False
+
+    def included(self, indices):
+        """Is a file that matches the patterns at `indices` (ascending)
+           included?
+        """
+        return bool(indices) and not self.exclude[indices[-1]]
+
+    def restrict(self, states):
+        """Return the states (one per pattern) that matter in a directory
+           with `states`, or None if nothing below the directory can be
+           included.  If an exclude pattern matches everything below the
+           directory, the patterns before it (and itself) no longer matter.
+        """
+        for k in reversed(range(len(states))):
+            if states[k] and self.exclude[k] and \
+                    self._pats[k].universal(states[k]):
+                states = (_EMPTY,) * (k + 1) + tuple(states[k + 1:])
+                break
+        for st, exclude in zip(states, self.exclude):
+            if st and not exclude:
+                return tuple(states)
+        return None
+
+
+@functools.lru_cache(maxsize=256)
+def compile_globset(patterns):
+    """Return the (cached) :class:`GlobSet` for the tuple `patterns` (or a
+       single pattern string).
+    """
+    if isinstance(patterns, str):
+        patterns = (patterns,)
+    return GlobSet(patterns)
+
+
+def _probe(path):
+    """Return ``(is_dir, descend)`` for `path`, or None if it doesn't
+       exist.  Like :func:`os.walk`, symlinks to directories are directories
+       that are not descended into.
+    """
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if stat.S_ISLNK(st.st_mode):
+        return os.path.isdir(path), False
+    is_dir = stat.S_ISDIR(st.st_mode)
+    return is_dir, is_dir
+
+
+def _scan(path, stats=None):
+    """Yield ``(name, fullpath, is_dir, descend)`` for the non-dot entries
+       in directory `path`.
+    """
+    try:
+        with os.scandir(path) as it:
+            entries = list(it)
+    except OSError:
+        return
+    if stats is not None:
+        stats.add(dirs=1, entries=len(entries))
+    for entry in entries:
+        name = entry.name
+        if name.startswith('.'):
+            if stats is not None:
+                stats.skip('dotfile')
+            continue
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        yield name, entry.path, is_dir, is_dir and not entry.is_symlink()
+
+
+def _literal(pats, states):
+    """Return the single name that all active patterns require, if any.
+    """
+    res = None
+    for pat, st in zip(pats, states):
+        if not st:
+            continue
+        name = pat.literal(st)
+        if name is None or (res is not None and name != res):
+            return None
+        res = name
+    return res
+
+
+def iter_matches(root, patterns, restrict=None, stats=None, workers=None):
+    """Walk `root` once and yield ``(fullpath, relpath, indices)`` for every
+       file that matches at least one of `patterns`, where `indices` is a
+       tuple of the indices of the matching patterns.  Directories are only
+       entered if at least one pattern can match inside them, and
+       ``restrict(states)`` (if given) can reduce the states of a directory
+       (or return None to skip it).  The files are yielded in the same order
+       as a top-down :func:`os.walk` (`relpath` is in lower case if
+       :data:`CASEFOLD` is set).
+
+       Directories listed, entries seen, and names probed (with ``lstat``)
+       are counted in `stats` if given.  With `workers`, directories are
+       listed in a pool of threads (see :func:`dkfileutils.walker.walk`).
+    """
+    pats = [compile_glob(pattern) for pattern in patterns]
+    indices = range(len(pats))
+    casefold = CASEFOLD
+
+    def fetch(path, data):
+        name = _literal(pats, data[1])
+        if name is None:
+            return list(_scan(path, stats))
+        if name.startswith('.'):
+            return []
+        fullpath = os.path.join(path, name)
+        probed = _probe(fullpath)
+        if stats is not None:
+            stats.add(stat_calls=1)
+        return [] if probed is None else [(name, fullpath) + probed]
+
+    def visit(_path, data, entries):
+        prefix, states = data
+        files = []
+        subdirs = []
+        for name, fullpath, is_dir, descend in entries:
+            if casefold:
+                name = name.lower()
+            relpath = prefix + name
+            matched = []
+            nxt = []
+            for i in indices:
+                if states[i]:
+                    m, n = pats[i].step(states[i], name, relpath, is_dir)
+                    if m:
+                        matched.append(i)
+                    nxt.append(n)
+                else:
+                    nxt.append(_EMPTY)
+            if is_dir:
+                if descend and any(nxt):
+                    nxt = restrict(nxt) if restrict else tuple(nxt)
+                    if nxt is not None:
+                        subdirs.append((fullpath, (relpath + '/', nxt)))
+            elif matched:
+                files.append((fullpath, relpath, tuple(matched)))
+        return files, subdirs
+
+    start = tuple(pat.start() for pat in pats)
+    return walk(root, fetch, visit, ('', start), workers)
+
+
+def iter_glob(root, patterns, stats=None, workers=None):
+    """Yield the full path of all files under `root` that match `patterns`
+       (a pattern, or an ordered list of include and ``!``-exclude
+       patterns), in the same order as a top-down :func:`os.walk`.  The
+       tree is traversed once, and excluded directories are not entered.
+    """
+    if not isinstance(patterns, str):
+        patterns = tuple(patterns)
+    globset = compile_globset(patterns)
+    for fullpath, _relpath, indices in iter_matches(
+            root, globset.positive, globset.restrict, stats, workers):
+        if globset.included(indices):
+            yield fullpath
@@ -4,11 +4,31 @@
 from __future__ import print_function
 import argparse
 import os
-from hashlib import md5
-from .path import Path
+import re
+import sys
+from .filehash import ALGORITHM, CHUNKSIZE, file_digest, threaded_map
+from .globber import translate
+from .profiling import add_profile_argument, profile_env, profiled
+from .stats import Stats, phase
+from .walker import listdir, walk
 
 SKIPFILE_NAME = '.skipfile'
 
+#: directory names that are never entered by :func:`list_files`.
+SKIPDIRS = (
+    '__pycache__', '.git', '.svn', 'htmlcov', 'dist', 'build',
+    '.idea', 'tasks', 'static', 'media', 'data', 'migrations',
+    '.doctrees', '_static', 'node_modules', 'external',
+    'jobs', 'tryout', 'tmp', '_coverage',
+)
+
+#: files ending with any of these are skipped by :func:`list_files`.
+SKIPEXTS = (
+    '.pyc', '~', '.svg', '.txt', '.TTF', '.tmp', '.errmail',
+    '.email', '.bat', '.dll', '.exe', '.Dll', '.jpg', '.gif',
+    '.png', '.ico', '.db', '.md5'
+)
+
 
 def read_skipfile(dirname='.', defaults=None):
     """The .skipfile should contain one entry per line,
@@ -18,71 +38,169 @@ def read_skipfile(dirname='.', defaults=None):
     if defaults is None:
         defaults = ['Makefile', 'make.bat', 'atlassian-ide-plugin.xml']
     try:
-        return defaults + open(
-            os.path.join(dirname, SKIPFILE_NAME)
-        ).read().splitlines()
+        with open(os.path.join(dirname, SKIPFILE_NAME)) as fp:
+            return defaults + fp.read().splitlines()
     except IOError:
         return defaults
 
 
-def list_files(dirname='.', digest=True):
-    """Yield (digest, fname) tuples for all interesting files
-       in `dirname`.
+class SkipRules:
+    """The rules that decide which files and directories are skipped by
+       :func:`list_files`.  The rules are compiled once, so the cost of
+       checking a file does not grow with the number of entries.
+
+       ``skipfiles`` are paths relative to the root of the listing (using
+       ``/`` as separator), and can contain glob patterns (``*``, ``?``,
+       ``[..]``, and ``**/``).  Entries that match a directory prune the
+       entire directory.
     """
-    skipdirs = [
-        '__pycache__', '.git', '.svn', 'htmlcov', 'dist', 'build',
-        '.idea', 'tasks', 'static', 'media', 'data', 'migrations',
-        '.doctrees', '_static', 'node_modules', 'external',
-        'jobs', 'tryout', 'tmp', '_coverage',
-    ]
-    skipexts = [
-        '.pyc', '~', '.svg', '.txt', '.TTF', '.tmp', '.errmail',
-        '.email', '.bat', '.dll', '.exe', '.Dll', '.jpg', '.gif',
-        '.png', '.ico', '.db', '.md5'
-    ]
-    dirname = str(dirname)
-    skipfiles = read_skipfile(dirname)
+    def __init__(self, skipfiles=(), skipdirs=SKIPDIRS, skipexts=SKIPEXTS):
+        self.skipdirs = frozenset(skipdirs)
+        self.skipexts = tuple(skipexts)
+        self.skipfiles = set()
+        patterns = []
+        for entry in skipfiles:
+            entry = entry.strip().rstrip('/')
+            if not entry or entry.startswith('#'):
+                continue
+            if any(ch in entry for ch in '*?['):
+                patterns.append(translate(entry))
+            else:
+                self.skipfiles.add(entry)
+        if patterns:
+            rx = re.compile('(?s)(?:%s)\\Z' % '|'.join(patterns))
+            self._skip_match = rx.match
+        else:
+            self._skip_match = None
+
+    @classmethod
+    def from_skipfile(cls, dirname='.', **kw):
+        """Create rules from the defaults and the .skipfile in `dirname`.
+        """
+        return cls(read_skipfile(dirname), **kw)
+
+    def _skipped(self, relpath):
+        if relpath in self.skipfiles:
+            return True
+        return self._skip_match is not None and self._skip_match(relpath)
 
-    def clean_dirs(directories):
-        """Remove directories that should be skipped.
+    def keep_dir(self, dname, relpath):
+        """Returns False if the directory should be skipped.
         """
-        for d in directories:
-            if d.endswith('.egg-info'):
-                directories.remove(d)
-        for d in skipdirs:
-            if d in directories:
-                directories.remove(d)
-
-    def keep_file(filename, filepath):
+        if dname.startswith('.') or dname.endswith('.egg-info'):
+            return False
+        if dname in self.skipdirs:
+            return False
+        return not self._skipped(relpath)
+
+    def keep_file(self, filename, relpath):
         """Returns False if the file should be skipped.
         """
-        if filename.startswith('.'):
-            return False
-        if filepath in skipfiles:
+        if filename.startswith('.') or filename.endswith(self.skipexts):
             return False
-        for ext in skipexts:
-            if filename.endswith(ext):
-                return False
-        return True
-
-    for root, dirs, files in os.walk(os.path.abspath(dirname)):
-        clean_dirs(dirs)
-        for fname in files:
-            relpth = os.path.relpath(
-                os.path.join(root, fname),
-                dirname
-            ).replace('\\', '/')
-
-            parts = Path(relpth).parts()
-            if not keep_file(fname, relpth) or \
-                    any(p.startswith('.') for p in parts):
-                continue
+        return not self._skipped(relpath)
 
-            pth = os.path.join(dirname, relpth)
-            if digest:
-                yield md5(open(pth, 'rb').read()).hexdigest(), relpth
-            else:
-                yield relpth
+    def reason(self, name, relpath, is_dir):
+        """Return the rule that skips the entry `name` (``'dotfile'``,
+           ``'egg-info'``, ``'skipdirs'``, ``'skipexts'``, or
+           ``'skipfile'``), or None if it is kept.
+        """
+        if name.startswith('.'):
+            return 'dotfile'
+        if is_dir and name.endswith('.egg-info'):
+            return 'egg-info'
+        if is_dir and name in self.skipdirs:
+            return 'skipdirs'
+        if not is_dir and name.endswith(self.skipexts):
+            return 'skipexts'
+        if self._skipped(relpath):
+            return 'skipfile'
+        return None
+
+
+@profile_env
+def list_files(dirname='.', digest=True, chunksize=CHUNKSIZE, workers=None,
+               algorithm=ALGORITHM, skiprules=None, stats=None):
+    """Yield (digest, fname) tuples for all interesting files
+       in `dirname` (or only fname if `digest` is False).  Digests use the
+       hash `algorithm` (md5 by default).
+
+       Files and directories are skipped according to `skiprules` (a
+       :class:`SkipRules` instance), which defaults to the standard rules
+       and the .skipfile in `dirname`.
+
+       Files are hashed ``chunksize`` bytes at a time.  With `workers`,
+       directories are listed and files are hashed in pools of `workers`
+       threads (the output order is unchanged).
+
+       The work done is counted in `stats` (a
+       :class:`~dkfileutils.stats.Stats`) if given.
+    """
+    dirname = str(dirname)
+    if skiprules is None:
+        skiprules = SkipRules.from_skipfile(dirname)
+    keep_dir = skiprules.keep_dir
+    keep_file = skiprules.keep_file
+
+    def fetch(path, _prefix):
+        with phase(stats, 'scandir'):
+            entries = listdir(path)
+            if entries is None:
+                return None
+            res = []
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                res.append((entry.name, entry.path, is_dir,
+                            is_dir and entry.is_symlink()))
+            return res
+
+    def visit(_path, prefix, entries):
+        """Return the relative names of the interesting files in the
+           directory, and the subdirectories to enter.
+        """
+        files = []
+        subdirs = []
+        if entries is None:
+            return files, subdirs
+        if stats is not None:
+            stats.add(dirs=1, entries=len(entries))
+        for name, path, is_dir, is_link in entries:
+            if is_dir:
+                # like os.walk, don't follow symlinks to directories
+                if is_link:
+                    continue
+                if keep_dir(name, prefix + name):
+                    subdirs.append((path, prefix + name + '/'))
+                elif stats is not None:
+                    stats.skip(skiprules.reason(name, prefix + name, True))
+            elif keep_file(name, prefix + name):
+                files.append(prefix + name)
+            elif stats is not None:
+                stats.skip(skiprules.reason(name, prefix + name, False))
+        return files, subdirs
+
+    def relpaths():
+        """Yield the relative names of all interesting files (in the same
+           order as a top-down :func:`os.walk`).
+
+           The relative path of each directory is carried down the
+           traversal, and skipped directories are never entered.
+        """
+        return walk(os.path.abspath(dirname), fetch, visit, '', workers)
+
+    if not digest:
+        yield from relpaths()
+        return
+
+    def hash_file(relpth):
+        fname = os.path.join(dirname, relpth)
+        with phase(stats, 'hash'):
+            return file_digest(fname, chunksize, algorithm, stats), relpth
+
+    yield from threaded_map(hash_file, relpaths(), workers)
 
 
 def main():  # pragma: nocover
@@ -97,6 +215,19 @@ def main():  # pragma: nocover
         '--verbose', '-v', action='store_true',
         help="Increase verbosity."
     )
+    p.add_argument(
+        '--jobs', '-j', type=int, default=None,
+        help="Number of threads used for listing and hashing."
+    )
+    p.add_argument(
+        '--algorithm', '-a', default=ALGORITHM,
+        help="Hash algorithm (e.g. md5, sha1, sha256, blake2b)."
+    )
+    p.add_argument(
+        '--stats', action='store_true',
+        help="Print i/o and timing statistics to stderr."
+    )
+    add_profile_argument(p)
 
     args = p.parse_args()
     args.curdir = os.getcwd()
@@ -105,8 +236,13 @@ def main():  # pragma: nocover
     if args.verbose:
         print(args)
 
-    for chsm, fname in list_files(args.directory):
-        print(chsm, fname)
+    stats = Stats() if args.stats else None
+    with profiled(args.profile):
+        for chsm, fname in list_files(args.directory, workers=args.jobs,
+                                      algorithm=args.algorithm, stats=stats):
+            print(chsm, fname)
+    if stats is not None:
+        print(stats, file=sys.stderr)
 
 
 if __name__ == "__main__":  # pragma: nocover
@@ -0,0 +1,388 @@
+"""Per-file stat and digest records for a directory tree.
+
+   A manifest maps relative file names to the file's size, modification
+   time, inode, and content digest.  When a directory is re-scanned, only
+   files whose stat information differs from the previous manifest are
+   re-read and re-hashed.
+
+   The manifest also contains a Merkle tree of the directories: the hash of
+   a directory is computed from the names and hashes of its children, so
+   unchanged subtrees keep their hash, and two manifests can be compared
+   top-down by only descending into directories whose hashes differ.
+"""
+import os
+import re
+from collections import namedtuple
+
+from .filehash import (
+    ALGORITHM, CHUNKSIZE, file_digest, new_hasher, threaded_map
+)
+from .stats import phase
+
+#: first line of a manifest file.
+MANIFEST_HEADER = '# dkfileutils manifest 1'
+
+#: The stat information and content digest of one file.
+FileRecord = namedtuple('FileRecord', 'size mtime_ns ino digest')
+
+
+class Changes(namedtuple('Changes', 'added removed modified')):
+    """Sorted lists of the relative names of files that were added,
+       removed, and modified.  True if anything changed.
+    """
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+
+def _escape(relpath):
+    """Escape backslashes and newlines in `relpath` (one record per line).
+    """
+    return relpath.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _unescape(relpath):
+    if '\\' not in relpath:
+        return relpath
+    return re.sub(r'\\(.)', _unescape_char, relpath)
+
+
+def _unescape_char(m):
+    return '\n' if m.group(1) == 'n' else m.group(1)
+
+
+def _ancestors(relpath):
+    """Yield the relative names of all directories containing `relpath`
+       (the root directory is ``''``).
+    """
+    while relpath:
+        relpath = relpath.rpartition('/')[0]
+        yield relpath
+
+
+def _join(reldir, name):
+    return reldir + '/' + name if reldir else name
+
+
+def _depth(reldir):
+    return reldir.count('/') + bool(reldir)
+
+
+class Manifest:
+    """The records for all files in a directory tree, keyed by relative
+       file name (using ``/`` as separator).
+    """
+    def __init__(self, files=None, timestamp_ns=0, algorithm=ALGORITHM):
+        #: relpath -> FileRecord
+        self.files = files if files is not None else {}
+        #: the hash algorithm used for the file digests.
+        self.algorithm = algorithm
+        #: the modification time of the file this manifest was read from.
+        self.timestamp_ns = timestamp_ns
+        #: number of files that were (re-)hashed when creating this manifest.
+        self.hashed = 0
+        #: reldir -> directory hash (root is ``''``), see :meth:`merkle`.
+        self.dirs = {}
+        self._tree = None       # cached result of _children()
+        self._dirty = set()     # directories that need to be re-hashed
+
+    def __eq__(self, other):
+        return (isinstance(other, Manifest)
+                and self.algorithm == other.algorithm
+                and self.files == other.files)
+
+    def aggregate(self):
+        """Return a digest of all the files (names and contents) in the
+           manifest (the hash of the root directory).
+        """
+        if '' not in self.dirs:
+            self.merkle()
+        elif self._dirty:
+            self._refresh()
+        return self.dirs['']
+
+    def update(self, relpath, rec):
+        """Set the record for `relpath` to `rec` (or remove it if `rec` is
+           None).  Only the directories containing `relpath` will be
+           re-hashed by the next call to :meth:`aggregate`.
+        """
+        tree = self._index()
+        if rec is None:
+            if self.files.pop(relpath, None) is None:
+                return
+            name = relpath
+            for reldir in _ancestors(relpath):
+                tree[reldir].discard(name.rpartition('/')[2])
+                if tree[reldir] or not reldir:
+                    break
+                # remove directories that became empty
+                del tree[reldir]
+                self.dirs.pop(reldir, None)
+                name = reldir
+        else:
+            if relpath not in self.files:
+                name = relpath
+                for reldir in _ancestors(relpath):
+                    if reldir in tree:
+                        tree[reldir].add(name.rpartition('/')[2])
+                        break
+                    tree[reldir] = {name.rpartition('/')[2]}
+                    name = reldir
+            self.files[relpath] = rec
+        self._dirty.update(_ancestors(relpath))
+
+    def subtree(self, reldir):
+        """Return the relative names of all files below `reldir`.
+        """
+        tree = self._index()
+        res = []
+        stack = [reldir] if reldir in tree else []
+        while stack:
+            d = stack.pop()
+            for name in tree[d]:
+                relpath = _join(d, name)
+                if relpath in tree:
+                    stack.append(relpath)
+                else:
+                    res.append(relpath)
+        return res
+
+    def _index(self):
+        if self._tree is None:
+            self._tree = self._children()
+        return self._tree
+
+    def _children(self):
+        """Return a dict mapping each directory to the names of its
+           direct children (files and directories).
+        """
+        children = {'': set()}
+        for relpath in self.files:
+            name = relpath
+            for reldir in _ancestors(relpath):
+                if reldir in children:
+                    children[reldir].add(name.rpartition('/')[2])
+                    break
+                children[reldir] = {name.rpartition('/')[2]}
+                name = reldir
+        return children
+
+    def merkle(self, previous=None):
+        """Compute the hash of every directory, bottom-up, and return the
+           hash of the root directory.
+
+           Directories that don't contain any added, removed, or modified
+           files compared to `previous` re-use the hash from `previous`.
+        """
+        children = self._children()
+        dirty = None
+        if previous is not None and previous.algorithm == self.algorithm \
+                and previous.dirs:
+            dirty = set()
+            for relpath, rec in self.files.items():
+                old = previous.files.get(relpath)
+                if old is None or old.digest != rec.digest:
+                    dirty.update(_ancestors(relpath))
+            for relpath in previous.files.keys() - self.files.keys():
+                dirty.update(_ancestors(relpath))
+
+        dirs = {}
+        # deepest directories first, so subdirectory hashes are available
+        for reldir in sorted(children, key=_depth, reverse=True):
+            if dirty is not None and reldir not in dirty \
+                    and reldir in previous.dirs:
+                dirs[reldir] = previous.dirs[reldir]
+            else:
+                dirs[reldir] = self._hash_dir(reldir, children[reldir], dirs)
+        self.dirs = dirs
+        self._tree = children
+        self._dirty = set()
+        return dirs['']
+
+    def _refresh(self):
+        """Re-hash the directories marked as dirty by :meth:`update`.
+        """
+        tree = self._index()
+        for reldir in sorted(self._dirty & tree.keys(), key=_depth,
+                             reverse=True):
+            self.dirs[reldir] = self._hash_dir(reldir, tree[reldir], self.dirs)
+        self._dirty = set()
+
+    def _hash_dir(self, reldir, names, dirs):
+        """Return the hash of the directory `reldir`, containing `names`.
+        """
+        hasher = new_hasher(self.algorithm)
+        for name in sorted(names):
+            relpath = _join(reldir, name)
+            if relpath in self.files:
+                kind, digest = b'f', self.files[relpath].digest
+            else:
+                kind, digest = b'd', dirs[relpath]
+            hasher.update(kind + b' ' + name.encode('utf-8', 'surrogateescape')
+                          + b'\0')
+            hasher.update(digest.encode('ascii') + b'\n')
+        return hasher.hexdigest()
+
+    def diff(self, other):
+        """Yield the relative names of files that are added, removed, or
+           modified in `other` compared to `self`.  Only directories whose
+           hashes differ are visited.
+        """
+        if '' not in self.dirs:
+            self.merkle()
+        if '' not in other.dirs:
+            other.merkle()
+        mine = self._index()
+        theirs = other._index()
+        stack = ['']
+        while stack:
+            reldir = stack.pop()
+            if reldir in self.dirs and \
+                    self.dirs[reldir] == other.dirs.get(reldir):
+                continue
+            names = mine.get(reldir, set()) | theirs.get(reldir, set())
+            subdirs = []
+            for name in sorted(names):
+                relpath = _join(reldir, name)
+                if relpath in mine or relpath in theirs:
+                    subdirs.append(relpath)
+                a = self.files.get(relpath)
+                b = other.files.get(relpath)
+                if (a or b) and (a is None or b is None or
+                                 a.digest != b.digest):
+                    yield relpath
+            stack.extend(reversed(subdirs))
+
+    def changes(self, other):
+        """Return the :class:`Changes` from `self` to `other`.
+        """
+        added, removed, modified = [], [], []
+        for relpath in self.diff(other):
+            if relpath not in self.files:
+                added.append(relpath)
+            elif relpath not in other.files:
+                removed.append(relpath)
+            else:
+                modified.append(relpath)
+        return Changes(sorted(added), sorted(removed), sorted(modified))
+
+    @classmethod
+    def read(cls, fname):
+        """Read the manifest stored in `fname`.  Returns None if `fname`
+           doesn't exist or doesn't contain a manifest.
+        """
+        try:
+            with open(fname, encoding='utf-8', errors='surrogateescape',
+                      newline='') as fp:
+                lines = fp.read().split('\n')
+            timestamp_ns = os.stat(fname).st_mtime_ns
+        except (IOError, UnicodeDecodeError):
+            return None
+        if not lines or lines[0] != MANIFEST_HEADER:
+            return None
+        files = {}
+        meta = {}
+        dirs = {}
+        for line in lines[1:]:
+            if not line:
+                continue
+            if line.startswith('# '):
+                key, _, value = line[2:].partition(': ')
+                meta[key] = value
+                continue
+            try:
+                if line.startswith('D\t'):
+                    _, digest, reldir = line.split('\t', 2)
+                    dirs[_unescape(reldir)] = digest
+                    continue
+                digest, size, mtime_ns, ino, relpath = line.split('\t', 4)
+                files[_unescape(relpath)] = FileRecord(
+                    int(size), int(mtime_ns), int(ino), digest
+                )
+            except ValueError:
+                return None
+        if 'algorithm' not in meta:
+            return None
+        res = cls(files, timestamp_ns, meta['algorithm'])
+        res.dirs = dirs
+        return res
+
+    def write(self, fname):
+        """Write the manifest to `fname` (atomically replacing it).  File
+           names are stored with backslashes and newlines escaped, and names
+           that aren't valid UTF-8 are written with ``surrogateescape``.
+        """
+        lines = [MANIFEST_HEADER, '# algorithm: %s' % self.algorithm]
+        for relpath in sorted(self.files):
+            rec = self.files[relpath]
+            lines.append('%s\t%d\t%d\t%d\t%s' % (
+                rec.digest, rec.size, rec.mtime_ns, rec.ino, _escape(relpath)
+            ))
+        for reldir in sorted(self.dirs):
+            lines.append('D\t%s\t%s' % (self.dirs[reldir], _escape(reldir)))
+        # write to a temporary file first, so concurrent readers never see
+        # a partially written manifest.
+        tmp = '%s.%d.tmp' % (fname, os.getpid())
+        try:
+            with open(tmp, 'w', encoding='utf-8', errors='surrogateescape',
+                      newline='') as fp:
+                fp.write('\n'.join(lines) + '\n')
+            os.replace(tmp, fname)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def lookup(self, relpath, st):
+        """Return the cached digest of `relpath` if its stat result `st`
+           is unchanged, otherwise None.
+
+           Files that were modified at, or after, the time the manifest
+           was written are never trusted (their contents could have
+           changed without their mtime changing).
+        """
+        rec = self.files.get(relpath)
+        if rec is None:
+            return None
+        if (rec.size, rec.mtime_ns, rec.ino) != (
+                st.st_size, st.st_mtime_ns, st.st_ino):
+            return None
+        if st.st_mtime_ns >= self.timestamp_ns:
+            return None
+        return rec.digest
+
+    @classmethod
+    def scan(cls, dirname, relpaths, previous=None, chunksize=CHUNKSIZE,
+             workers=None, algorithm=ALGORITHM, stats=None):
+        """Create a manifest for the files `relpaths` in `dirname`, re-using
+           digests from the `previous` manifest for files whose stat
+           information is unchanged.  Files are stat'ed and hashed in a pool
+           of `workers` threads if specified.
+
+           Nothing is re-used if `previous` was created with a different
+           hash `algorithm`.  The stat calls and hashing are counted in
+           `stats` if given.
+        """
+        new_hasher(algorithm)  # fail early for unknown algorithms
+        if previous is not None and previous.algorithm != algorithm:
+            previous = None
+
+        def record(relpath):
+            fname = os.path.join(dirname, relpath)
+            st = os.stat(fname)
+            if stats is not None:
+                stats.add(stat_calls=1)
+            digest = previous.lookup(relpath, st) if previous else None
+            hashed = digest is None
+            if hashed:
+                with phase(stats, 'hash'):
+                    digest = file_digest(fname, chunksize, algorithm, stats)
+            rec = FileRecord(st.st_size, st.st_mtime_ns, st.st_ino, digest)
+            return relpath, rec, hashed
+
+        res = cls(algorithm=algorithm)
+        for relpath, rec, hashed in threaded_map(record, relpaths, workers):
+            res.files[relpath] = rec
+            res.hashed += hashed
+        return res
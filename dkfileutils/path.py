@@ -10,7 +10,25 @@ import re
 from contextlib import contextmanager
 import shutil
 
-from typing import BinaryIO, Text
+from typing import BinaryIO, Iterator, Text
+
+from . import statcache
+from .globber import iter_glob
+from .walker import listdir, walk
+
+
+# on POSIX, normcase is a no-op, and joining a normalized path with a plain
+# name gives a normalized path.
+_POSIX = os.name == 'posix'
+
+
+def _normalized(pth):
+    """Is `pth` (a non-empty posix path) unchanged by os.path.normpath?
+       (Conservatively, i.e. no segment may start with a dot.)
+    """
+    # (str.find, since Path.__contains__ tests directory membership)
+    return not (pth[0] == '.' or pth[-1] == '/' or pth.find('/.') >= 0
+                or pth.find('//') >= 0)
 
 
 def doc(srcfn):
@@ -28,12 +46,16 @@ class Path(str):
     """
 
     def __new__(cls, *args, **kw):
-        if isinstance(args[0], Path):
-            return str.__new__(cls, str(args[0]), **kw)
+        if isinstance(args[0], Path) or (_POSIX and args[0].__class__ is str):
+            return str.__new__(cls, args[0], **kw)
         else:
             return str.__new__(cls, os.path.normcase(args[0]), **kw)
 
     def __div__(self, other: Path | str) -> 'Path':
+        if _POSIX and self and other.__class__ is str and _is_name(other) \
+                and _normalized(self):
+            # cheap join of a plain name (the result is normalized)
+            return str.__new__(Path, '/'.join((self, other)))
         return Path(
             os.path.normcase(
                 os.path.normpath(
@@ -46,8 +68,11 @@ class Path(str):
     @doc(os.unlink)
     def unlink(self) -> None:
         os.unlink(self)
+        statcache.invalidate(self)
 
     def open(self, mode='r') -> BinaryIO:
+        if statcache._local.active and mode != 'r' and mode != 'rb':
+            statcache.invalidate(self)
         return open(str(self), mode)
 
     def read(self, mode='r') -> Text:
@@ -57,36 +82,60 @@ class Path(str):
     def write(self, txt, mode='w'):
         with self.open(mode) as fp:
             fp.write(txt)
+        statcache.invalidate(self)
 
     def append(self, txt, mode='a'):
         with self.open(mode) as fp:
             fp.write(txt)
+        statcache.invalidate(self)
 
     def __iter__(self):
-        for root, dirs, files in os.walk(self):
-            dotdirs = [d for d in dirs if d.startswith('.')]
-            for d in dotdirs:
-                dirs.remove(d)
-            dotfiles = [d for d in files if d.startswith('.')]
-            for d in dotfiles:
-                files.remove(d)
-            for fname in files:
-                yield Path(os.path.join(root, fname))
+        return self.iterfiles()
+
+    def iterfiles(self, workers=None) -> Iterator[Path]:
+        """Yield all files below `self`, skipping files and directories
+           whose names start with a dot (this is what iterating over a
+           path does).  The files are yielded in the same order as a
+           top-down :func:`os.walk`, also when `workers` threads are used
+           to list directories concurrently.
+        """
+        def visit(_path, _data, entries):
+            files = []
+            subdirs = []
+            for entry in entries or ():
+                name = entry.name
+                if name.startswith('.'):
+                    continue
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    files.append(Path(entry.path))
+                elif not entry.is_symlink():
+                    subdirs.append((entry.path, None))
+            return files, subdirs
+
+        return walk(self, listdir, visit, workers=workers)
 
     def __contains__(self, item):
-        if self.isdir():
-            return item in self.listdir()
+        if self and isinstance(item, str) and _is_name(item):
+            if statcache.lexists(os.path.join(self, item)):
+                return True  # (so self must be a directory)
+            if self.isdir():
+                return False
+        elif self.isdir():
+            return False  # not a directory entry
         return super(Path, self).__contains__(item)
 
     @doc(shutil.rmtree)
     def rmtree(self, subdir=None):
-        if subdir is not None:
-            shutil.rmtree(self / subdir, ignore_errors=True)
-        else:
-            shutil.rmtree(self, ignore_errors=True)
+        target = self / subdir if subdir is not None else self
+        shutil.rmtree(target, ignore_errors=True)
+        statcache.invalidate(target, tree=True)
 
     def contents(self):
-        res = [d.relpath(self) for d in self.glob('**/*')]
+        res = [d.relpath(self) for d in self.iglob('**/*')]
         res.sort()
         return res
 
@@ -103,6 +152,7 @@ class Path(str):
               https://github.com/python/cpython/blob/master/Lib/pathlib.py)
 
         """
+        statcache.invalidate(self)
         if exist_ok:
             # First try to bump modification time
             # Implementation note: GNU touch uses the UTIME_NOW option of
@@ -120,39 +170,52 @@ class Path(str):
         fd = os.open(self, flags, mode)
         os.close(fd)
 
-    def glob(self, pat: str) -> list[Path]:
+    def glob(self, pat: str | list[str], stats=None,
+             workers=None) -> list[Path]:
         """`pat` can be an extended glob pattern, e.g. `'**/*.less'`
            This code handles negations similarly to node.js' minimatch, i.e.
            a leading `!` will negate the entire pattern.
+
+           `pat` can also be an ordered list of patterns, e.g.
+           ``['**/*.js', '!vendor/**', 'vendor/keep.js']``, where a file is
+           included if the last pattern that matches it doesn't start with
+           `!`.  The tree is walked once for all the patterns.
+
+           Only directories that can contain matches are visited, e.g.
+           `'static/css/*.css'` only lists the `static/css` directory, and
+           excluded directories (like `vendor` above) are not entered.
+
+           The directories and entries visited are counted in `stats` (a
+           :class:`~dkfileutils.stats.Stats`) if given.  With `workers`,
+           directories are listed in a pool of threads (the order of the
+           result is the same).
         """
-        r = ""
-        negate = int(pat.startswith('!'))
-        i = negate
-
-        while i < len(pat):
-            if pat[i:i + 3] == '**/':
-                r += "(?:.*/)?"
-                i += 3
-            elif pat[i] == "*":
-                r += "[^/]*"
-                i += 1
-            elif pat[i] == ".":
-                r += "[.]"
-                i += 1
-            elif pat[i] == "?":
-                r += "."
-                i += 1
-            else:
-                r += pat[i]
-                i += 1
-        r = r'(?ms)' + r + r'\Z'
-        rx = re.compile(r)
+        return list(self.iglob(pat, stats, workers))
 
-        def match(d):
-            m = rx.match(d)
-            return not m if negate else m
+    def iglob(self, pat: str | list[str], stats=None,
+              workers=None) -> Iterator[Path]:
+        """Like :meth:`glob`, but yields the matches as they are found
+           while walking the tree (use e.g. ``itertools.islice`` to get the
+           first N matches without visiting the rest of the tree).
+        """
+        for fname in iter_glob(self, pat, stats, workers):
+            yield Path(fname)
+
+    def glob_exists(self, pat: str | list[str]) -> bool:
+        """Is there at least one file that matches `pat`?  (Returns at the
+           first match.)
+        """
+        for _fname in iter_glob(self, pat):
+            return True
+        return False
 
-        return [s for s in self if match(s.relpath(self).replace('\\', '/'))]
+    def first_match(self, pat: str | list[str]) -> Path | None:
+        """Return the first file that matches `pat` (in :meth:`glob` order),
+           or None if there are no matches.
+        """
+        for fname in iter_glob(self, pat):
+            return Path(fname)
+        return None
 
     @doc(os.path.abspath)
     def abspath(self):
@@ -183,7 +246,7 @@ class Path(str):
 
     @doc(os.path.exists)
     def exists(self):
-        return os.path.exists(self)
+        return statcache.exists(self)
 
     @doc(os.path.expanduser)
     def expanduser(self):
@@ -195,19 +258,19 @@ class Path(str):
 
     @doc(os.path.getatime)
     def getatime(self):
-        return os.path.getatime(self)
+        return statcache.stat(self).st_atime
 
     @doc(os.path.getctime)
     def getctime(self):
-        return os.path.getctime(self)
+        return statcache.stat(self).st_ctime
 
     @doc(os.path.getmtime)
     def getmtime(self):
-        return os.path.getmtime(self)
+        return statcache.stat(self).st_mtime
 
     @doc(os.path.getsize)
     def getsize(self):
-        return os.path.getsize(self)
+        return statcache.stat(self).st_size
 
     @doc(os.path.isabs)
     def isabs(self):
@@ -215,15 +278,17 @@ class Path(str):
 
     @doc(os.path.isdir)
     def isdir(self, *args, **kw):
-        return os.path.isdir(self, *args, **kw)
+        if args or kw:
+            return os.path.isdir(self, *args, **kw)
+        return statcache.isdir(self)
 
     @doc(os.path.isfile)
     def isfile(self):
-        return os.path.isfile(self)
+        return statcache.isfile(self)
 
     @doc(os.path.islink)
     def islink(self):
-        return os.path.islink(self)
+        return statcache.islink(self)
 
     @doc(os.path.ismount)
     def ismount(self):
@@ -235,7 +300,7 @@ class Path(str):
 
     @doc(os.path.lexists)
     def lexists(self):
-        return os.path.lexists(self)
+        return statcache.lexists(self)
 
     @doc(os.path.normcase)
     def normcase(self):
@@ -326,31 +391,42 @@ class Path(str):
 
     @doc(os.chmod)
     def chmod(self, *args, **kw):
+        statcache.invalidate(self)
         return os.chmod(self, *args, **kw)
 
     def list(self, filterfn=lambda x: True):
         """Return all direct descendands of directory `self` for which
            `filterfn` returns True.
         """
-        return [self / p for p in self.listdir() if filterfn(self / p)]
+        return [Path(p) for p in self.scandir() if filterfn(p)]
 
     # @doc(os.listdir)
     def listdir(self):
-        return [Path(p) for p in os.listdir(self)]
+        return [Path(p) for p in statcache.listdir(self)]
+
+    def scandir(self, stat=False) -> Iterator[PathEntry]:
+        """Yield a :class:`PathEntry` for each direct descendant of
+           directory `self`.  The entries know whether they are
+           directories or files without any further system calls (on most
+           file systems).  With `stat`, each entry also gets ``size`` and
+           ``mtime`` attributes.
+        """
+        for entry in statcache.scandir(self):
+            yield PathEntry(self / entry.name, entry, stat)
 
     def subdirs(self):
         """Return all direct sub-directories.
         """
-        return self.list(lambda p: p.isdir())
+        return [Path(p) for p in self.scandir() if p.is_dir()]
 
     def files(self):
         """Return all files in directory.
         """
-        return self.list(lambda p: p.isfile())
+        return [Path(p) for p in self.scandir() if p.is_file()]
 
     @doc(os.lstat)
     def lstat(self):
-        return os.lstat(self)
+        return statcache.lstat(self)
 
     @doc(os.makedirs)
     def makedirs(self, path=None, mode=0o777):
@@ -359,16 +435,19 @@ class Path(str):
             os.makedirs(pth, mode)
         except OSError:
             pass
+        statcache.invalidate(pth, ancestors=True)
         return Path(pth)
 
     @doc(os.mkdir)
     def mkdir(self, path, mode=0o777):
         pth = os.path.join(self, path)
+        statcache.invalidate(pth)
         os.mkdir(pth, mode)
         return Path(pth)
 
     @doc(os.remove)
     def remove(self):
+        statcache.invalidate(self)
         return os.remove(self)
 
     def rm(self, fname=None):
@@ -383,26 +462,35 @@ class Path(str):
 
     @doc(os.removedirs)
     def removedirs(self):
+        statcache.invalidate(self, ancestors=True)
         return os.removedirs(self)
 
     @doc(shutil.move)
     def move(self, dst):
+        statcache.invalidate(self, tree=True)
+        statcache.invalidate(dst, tree=True)
         return shutil.move(self, dst)
 
     @doc(shutil.copy)
     def copy(self, dst):
+        statcache.invalidate(dst, tree=True)
         return shutil.copy(self, dst)
 
     @doc(os.rename)
-    def rename(self, *args, **kw):
-        return os.rename(self, *args, **kw)
+    def rename(self, dst, *args, **kw):
+        statcache.invalidate(self, tree=True)
+        statcache.invalidate(dst, tree=True)
+        return os.rename(self, dst, *args, **kw)
 
     @doc(os.renames)
-    def renames(self, *args, **kw):
-        return os.renames(self, *args, **kw)
+    def renames(self, dst, *args, **kw):
+        statcache.invalidate(self, tree=True, ancestors=True)
+        statcache.invalidate(dst, tree=True, ancestors=True)
+        return os.renames(self, dst, *args, **kw)
 
     @doc(os.rmdir)
     def rmdir(self):
+        statcache.invalidate(self, tree=True)
         return os.rmdir(self)
 
     if hasattr(os, 'startfile'):  # pragma: nocover
@@ -412,17 +500,67 @@ class Path(str):
 
     @doc(os.stat)
     def stat(self, *args, **kw):
-        return os.stat(self, *args, **kw)
+        if args or kw:
+            return os.stat(self, *args, **kw)
+        return statcache.stat(self)
 
     # @doc(os.utime)
     def utime(self, time=None):
         os.utime(self, time)
+        statcache.invalidate(self)
         return self.stat()
 
     def __add__(self, other):
         return Path(str(self) + str(other))
 
 
+class PathEntry(Path):
+    """A :class:`Path` yielded by :meth:`Path.scandir`, which remembers the
+       directory entry it was created from.  :meth:`is_dir`,
+       :meth:`is_file`, :meth:`is_symlink`, ``size`` and ``mtime`` describe
+       the entry when the directory was read.
+    """
+
+    def __new__(cls, pth, entry, stat=False):
+        self = str.__new__(cls, pth)
+        self.entry = entry
+        if stat:
+            try:
+                st = entry.stat()
+            except OSError:  # e.g. a dangling symlink
+                st = entry.stat(follow_symlinks=False)
+            self.size = st.st_size
+            self.mtime = st.st_mtime
+        return self
+
+    def __reduce__(self):
+        # the directory entry can't be copied or pickled
+        return Path, (str(self),)
+
+    @property
+    def name(self):
+        return self.entry.name
+
+    def is_dir(self):
+        return self.entry.is_dir()
+
+    def is_file(self):
+        return self.entry.is_file()
+
+    def is_symlink(self):
+        return self.entry.is_symlink()
+
+
+def _is_name(item):
+    """Is `item` a name that can be in a directory listing?
+    """
+    # (str.find, since ``in`` is a file system lookup if `item` is a Path)
+    return (item != '' and item != '.' and item != '..'
+            and str.find(item, os.sep) < 0
+            and not (os.altsep and str.find(item, os.altsep) >= 0)
+            and str.find(item, '\0') < 0)
+
+
 @contextmanager
 def cd(pth):
     cwd = os.getcwd()
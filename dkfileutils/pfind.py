@@ -3,10 +3,59 @@
    conataining filename (used for finding syncspec.txt and config files).
 """
 from __future__ import print_function
+import argparse
 import os
-import sys
+import time
 
+from .profiling import add_profile_argument, profile_env, profiled
 
+#: maximum number of directories in the lookup cache.
+CACHE_SIZE = 4096
+
+# directory -> ((mtime_ns, ino), {fname: exists})
+_cache = {}
+
+# directories modified less than this long ago are not cached, since
+# another change within the mtime granularity wouldn't be noticed.
+_RACY_NS = 2 * 10**9
+
+
+def clear_cache():
+    """Forget all cached lookups.
+    """
+    _cache.clear()
+
+
+def _present(d, fnames):
+    """Return the names in `fnames` that exist in the directory `d`.
+
+       The names are probed directly (instead of listing `d`), and the
+       results are cached until the modification time of `d` changes.
+    """
+    try:
+        st = os.stat(d)
+    except OSError:
+        return []
+    key = (st.st_mtime_ns, st.st_ino)
+    cached = _cache.get(d)
+    if cached is None or cached[0] != key:
+        cached = (key, {})
+        if time.time_ns() - st.st_mtime_ns > _RACY_NS:
+            if len(_cache) >= CACHE_SIZE:
+                _cache.clear()
+            _cache[d] = cached
+    names = cached[1]
+    res = []
+    for fname in fnames:
+        found = names.get(fname)
+        if found is None:
+            found = names[fname] = os.path.lexists(os.path.join(d, fname))
+        if found:
+            res.append(fname)
+    return res
+
+
+@profile_env
 def pfindall(path, *fnames):
     """Find all fnames in the closest ancestor directory.
        For the purposes of this function, we are our own closest ancestor.
@@ -34,6 +83,9 @@ def pfindall(path, *fnames):
        ``a/b/x.txt`` is not returned, since ``a/b/c/x.txt`` is the "closest"
        ``x.txt`` when starting from ``a/b/c`` (note: pfindall only looks
        "upwards", ie. towards the root).
+
+       Lookups are cached per directory (see :func:`clear_cache`), and
+       re-done when the directory is modified.
     """
     wd = os.path.abspath(path)
     assert os.path.isdir(wd)
@@ -50,12 +102,11 @@ def pfindall(path, *fnames):
             yield parent
 
     for d in parents():
-        curdirlist = os.listdir(d)
-        for fname in fnames:
-            if fname in curdirlist:
-                yield fname, os.path.normcase(os.path.join(d, fname))
+        for fname in _present(d, fnames):
+            yield fname, os.path.normcase(os.path.join(d, fname))
 
 
+@profile_env
 def pfind(path, *fnames):
     """Find the first fname in the closest ancestor directory.
        For the purposes of this function, we are our own closest ancestor, i.e.
@@ -75,6 +126,57 @@ def pfind(path, *fnames):
     return None
 
 
+@profile_env
+def pfind_many(paths, *fnames):
+    """Like :func:`pfind`, but for many start `paths` at once.  Returns a
+       dict mapping each path to the first of `fnames` in its closest
+       ancestor directory (or None).  A path that is not a directory starts
+       the search in the directory containing it, e.g.::
+
+           pfind_many(changed_files, 'setup.py')
+
+       Directories that are shared between the paths are only looked in
+       once.
+    """
+    found = {}     # directory -> result for paths starting there
+    res = {}
+    for path in paths:
+        d = os.path.abspath(path)
+        if not os.path.isdir(d):
+            d = os.path.dirname(d)
+        # climb until we reach a directory we've seen, or the root
+        chain = []
+        while d not in found:
+            chain.append(d)
+            parent = os.path.dirname(d)
+            if parent == d:
+                break
+            d = parent
+        result = found.get(d)
+        for d in reversed(chain):
+            present = _present(d, fnames)
+            if present:
+                result = os.path.normcase(os.path.join(d, present[0]))
+            found[d] = result
+        res[path] = found[chain[0]] if chain else result
+    return res
+
+
+def main():  # pragma: nocover
+    """Print the closest ancestor file.
+    """
+    p = argparse.ArgumentParser(
+        description="Find the closest ancestor directory containing "
+                    "filename."
+    )
+    p.add_argument('path', help="The directory to start in.")
+    p.add_argument('filename', nargs='+', help="The file(s) to look for.")
+    add_profile_argument(p)
+    args = p.parse_args()
+
+    with profiled(args.profile):
+        print(pfind(args.path, *args.filename))
+
+
 if __name__ == "__main__":  # pragma: nocover
-    _path, filename = sys.argv[1], sys.argv[2]
-    print(pfind(_path, filename))
+    main()
@@ -0,0 +1,98 @@
+"""Profile dkfileutils operations with :mod:`cProfile`.
+
+   The command line tools accept ``--profile [FILE]``, and library calls
+   are profiled when the environment variable ``DKFILEUTILS_PROFILE`` is
+   set.  In both cases the output is a report of the hottest functions on
+   stderr (for ``-`` or ``1``), a :mod:`pstats` file (for file names ending
+   in ``.prof`` or ``.pstats``), or a report appended to the named file.
+
+   Only the thread that starts the operation is profiled, and nested
+   operations (e.g. ``list_files`` called from ``changed``) are part of
+   the outermost profile.
+"""
+from __future__ import print_function
+import cProfile
+import functools
+import inspect
+import io
+import os
+import pstats
+import sys
+from contextlib import contextmanager
+
+#: environment variable that turns on profiling of library calls.
+PROFILE_ENV = 'DKFILEUTILS_PROFILE'
+
+#: sort order and number of functions in the reports.
+SORT = 'cumulative'
+LIMIT = 30
+
+_active = False
+
+
+def _write(profiler, output, sort=SORT, limit=LIMIT):
+    if output.endswith(('.prof', '.pstats')):
+        profiler.dump_stats(output)
+        return
+    buf = io.StringIO()
+    pstats.Stats(profiler, stream=buf).sort_stats(sort).print_stats(limit)
+    if output in ('-', '1'):
+        sys.stderr.write(buf.getvalue())
+    else:
+        with open(output, 'a') as fp:
+            fp.write(buf.getvalue())
+
+
+@contextmanager
+def profiled(output='-', sort=SORT, limit=LIMIT):
+    """Profile the ``with`` block and write the result to `output` (see
+       the module docstring).  Does nothing if `output` is empty, or if a
+       profile is already running.
+    """
+    global _active
+    if not output or _active:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    _active = True
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        _active = False
+        _write(profiler, output, sort, limit)
+
+
+def profile_env(fn):
+    """Decorator that profiles calls to `fn` (a function or a generator
+       function) when ``DKFILEUTILS_PROFILE`` is set.
+    """
+    if inspect.isgeneratorfunction(fn):
+        @functools.wraps(fn)
+        def genwrapper(*args, **kw):
+            output = os.environ.get(PROFILE_ENV)
+            if not output or _active:
+                return (yield from fn(*args, **kw))
+            with profiled(output):
+                return (yield from fn(*args, **kw))
+        return genwrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kw):
+        output = os.environ.get(PROFILE_ENV)
+        if not output or _active:
+            return fn(*args, **kw)
+        with profiled(output):
+            return fn(*args, **kw)
+    return wrapper
+
+
+def add_profile_argument(parser):
+    """Add the ``--profile [FILE]`` option to the argparse `parser`.
+    """
+    parser.add_argument(
+        '--profile', nargs='?', const='-', default=None, metavar='FILE',
+        help="Profile the run, and write a report to stderr (or to FILE, "
+             "a pstats file if it ends with .prof)."
+    )
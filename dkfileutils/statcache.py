@@ -0,0 +1,200 @@
+"""Memoize ``stat()`` and ``listdir()`` results for the duration of a
+   ``with`` block::
+
+       with fscache():
+           if p.isdir() and p.getmtime() > t:
+               ...
+
+   While a cache is active, the metadata methods of
+   :class:`~dkfileutils.path.Path` (``exists()``, ``isdir()``,
+   ``getmtime()``, ``listdir()``, ``scandir()``, ``subdirs()``, etc.) only
+   hit the file system the first time a path is asked about.  Changes made through
+   ``Path`` methods (``write()``, ``unlink()``, ``mkdir()``, ...) invalidate
+   the affected entries; changes made by other means are not noticed unless
+   :func:`invalidate` is called.
+
+   A cache is only used in the thread that entered the ``with`` block.
+   Other threads (including worker threads) are not affected by it, and
+   changes they make are not noticed.
+"""
+import os
+import stat as _stat
+import threading
+from contextlib import contextmanager
+
+
+class _Local(threading.local):
+    def __init__(self):
+        # the stack of caches active in this thread (innermost last).
+        self.active = []
+
+
+_local = _Local()
+
+
+def _scandir(path):
+    with os.scandir(path) as it:
+        return list(it)
+
+
+class FSCache:
+    """Cached ``stat``, ``lstat`` and ``scandir`` results, keyed by
+       absolute path.  Failures are cached too (and re-raised as new
+       exceptions).
+    """
+    def __init__(self):
+        self._stat = {}
+        self._lstat = {}
+        self._scandir = {}
+
+    def _lookup(self, table, fn, path):
+        key = os.path.abspath(path)
+        try:
+            res = table[key]
+        except KeyError:
+            try:
+                res = fn(path)
+            except OSError as e:
+                res = (e.errno, e.strerror)
+            table[key] = res
+        if res.__class__ is tuple:
+            raise OSError(res[0], res[1], path)
+        return res
+
+    def stat(self, path):
+        return self._lookup(self._stat, os.stat, path)
+
+    def lstat(self, path):
+        return self._lookup(self._lstat, os.lstat, path)
+
+    def scandir(self, path):
+        """Return a list of the :class:`os.DirEntry` objects for `path`.
+        """
+        return list(self._lookup(self._scandir, _scandir, path))
+
+    def listdir(self, path):
+        return [entry.name for entry in self.scandir(path)]
+
+    def invalidate(self, path, tree=False, ancestors=False):
+        """Forget `path` and its parent directory (whose listing and mtime
+           change when `path` is created or removed).  With `tree`, forget
+           everything below `path` too, and with `ancestors` all the
+           directories above it.
+        """
+        key = os.path.abspath(path)
+        keys = [key]
+        parent = os.path.dirname(key)
+        while parent not in keys:
+            keys.append(parent)
+            if not ancestors:
+                break
+            parent = os.path.dirname(parent)
+        for table in (self._stat, self._lstat, self._scandir):
+            for k in keys:
+                table.pop(k, None)
+            if tree:
+                prefix = os.path.join(key, '')
+                for k in [k for k in table if k.startswith(prefix)]:
+                    del table[k]
+
+    def clear(self):
+        for table in (self._stat, self._lstat, self._scandir):
+            table.clear()
+
+
+@contextmanager
+def fscache():
+    """Cache file system metadata for the duration of the ``with`` block.
+       Yields the :class:`FSCache`.
+    """
+    cache = FSCache()
+    active = _local.active
+    active.append(cache)
+    try:
+        yield cache
+    finally:
+        active.remove(cache)
+
+
+def invalidate(path, tree=False, ancestors=False):
+    """Forget `path` in all active caches (see :meth:`FSCache.invalidate`).
+    """
+    for cache in _local.active:
+        cache.invalidate(path, tree, ancestors)
+
+
+def stat(path):
+    active = _local.active
+    if active:
+        return active[-1].stat(path)
+    return os.stat(path)
+
+
+def lstat(path):
+    active = _local.active
+    if active:
+        return active[-1].lstat(path)
+    return os.lstat(path)
+
+
+def listdir(path):
+    active = _local.active
+    if active:
+        return active[-1].listdir(path)
+    return os.listdir(path)
+
+
+def scandir(path):
+    """Return a list of the :class:`os.DirEntry` objects for `path`.
+    """
+    active = _local.active
+    if active:
+        return active[-1].scandir(path)
+    return _scandir(path)
+
+
+def exists(path):
+    if not _local.active:
+        return os.path.exists(path)
+    try:
+        stat(path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def lexists(path):
+    if not _local.active:
+        return os.path.lexists(path)
+    try:
+        lstat(path)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def isdir(path):
+    if not _local.active:
+        return os.path.isdir(path)
+    try:
+        return _stat.S_ISDIR(stat(path).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+def isfile(path):
+    if not _local.active:
+        return os.path.isfile(path)
+    try:
+        return _stat.S_ISREG(stat(path).st_mode)
+    except (OSError, ValueError):
+        return False
+
+
+def islink(path):
+    if not _local.active:
+        return os.path.islink(path)
+    try:
+        return _stat.S_ISLNK(lstat(path).st_mode)
+    except (OSError, ValueError):
+        return False
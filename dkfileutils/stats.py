@@ -0,0 +1,104 @@
+"""Counters for the work done while walking directories and hashing files.
+
+   Pass a :class:`Stats` object as the ``stats`` argument of
+   :func:`~dkfileutils.listfiles.list_files`,
+   :func:`~dkfileutils.changed.digest`, :func:`~dkfileutils.changed.changed`
+   or :meth:`~dkfileutils.path.Path.glob` to find out where the time goes::
+
+       stats = Stats()
+       changed('src', stats=stats)
+       print(stats)
+
+   Nothing is counted unless a ``Stats`` object is passed.
+"""
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+#: the counters, in the order they are reported.
+COUNTERS = ('dirs', 'entries', 'files_opened', 'bytes_hashed', 'stat_calls')
+
+
+class Stats:
+    """Counters (safe to update from several threads):
+
+       - ``dirs``: directories listed
+       - ``entries``: directory entries seen
+       - ``skipped``: entries skipped, by rule (a :class:`collections.Counter`)
+       - ``files_opened``: files opened for hashing
+       - ``bytes_hashed``: bytes read and hashed
+       - ``stat_calls``: ``stat``/``lstat`` calls
+       - ``phases``: seconds spent in each phase (e.g. ``'walk'``,
+         ``'scandir'`` (part of walking), ``'hash'``).  Time spent in worker
+         threads is added up, so it can exceed the wall time.
+    """
+    def __init__(self):
+        self.dirs = 0
+        self.entries = 0
+        self.files_opened = 0
+        self.bytes_hashed = 0
+        self.stat_calls = 0
+        self.skipped = collections.Counter()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def add(self, **counts):
+        """Add `counts` to the counters, e.g. ``stats.add(dirs=1)``.
+        """
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def skip(self, rule):
+        """Count an entry skipped by `rule`.
+        """
+        with self._lock:
+            self.skipped[rule] += 1
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name):
+        """Add the time spent in the ``with`` block to phase `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def as_dict(self):
+        """Return the counters as a (json serializable) dict.
+        """
+        with self._lock:
+            res = {name: getattr(self, name) for name in COUNTERS}
+            res['skipped'] = dict(self.skipped)
+            res['phases'] = dict(self.phases)
+        return res
+
+    def report(self):
+        """Return a human readable report.
+        """
+        data = self.as_dict()
+        lines = ['%-14s %d' % (name + ':', data[name]) for name in COUNTERS]
+        for rule, n in sorted(data['skipped'].items()):
+            lines.append('%-14s %d' % ('skipped ' + rule + ':', n))
+        for phase, secs in data['phases'].items():
+            lines.append('%-14s %.3fs' % (phase + ':', secs))
+        return '\n'.join(lines)
+
+    __str__ = report
+
+
+@contextmanager
+def phase(stats, name):
+    """Like :meth:`Stats.phase`, but does nothing if `stats` is None.
+    """
+    if stats is None:
+        yield None
+    else:
+        with stats.phase(name):
+            yield stats
@@ -0,0 +1,67 @@
+"""Walk directory trees, optionally listing directories in a pool of
+   threads.
+
+   On network file systems (NFS, SMB) most of the time spent walking a
+   tree is waiting for ``readdir`` round-trips.  With ``workers``, the
+   directories that will be visited next are listed concurrently, while
+   the results are still produced in the same (top-down, depth first)
+   order as a serial walk.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def listdir(path, _data=None):
+    """Return a list of the :class:`os.DirEntry` objects in `path`, or None
+       if it can't be listed (usable as the `fetch` function of
+       :func:`walk`).
+    """
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return None
+
+
+def walk(root, fetch, visit, data=None, workers=None):
+    """Walk the tree below `root` top-down, in the same order as
+       :func:`os.walk`, and yield the results of `visit`.
+
+       For each directory, ``fetch(path, data)`` reads the directory (e.g.
+       :func:`listdir`), and ``visit(path, data, listing)`` is called with
+       its result, and returns ``(results, subdirs)``, where `results` is a
+       list of items to yield and `subdirs` is a list of ``(path, data)``
+       for the subdirectories to descend into (in order).  `data` is
+       carried down the tree (e.g. the relative path of the directory).
+
+       With `workers`, `fetch` is called in a pool of threads for the
+       directories that are next in line (at most a few per worker ahead of
+       time).  `visit` is always called in the calling thread, in order.
+    """
+    if not workers or workers <= 1:
+        stack = [(root, data)]
+        while stack:
+            path, d = stack.pop()
+            results, subdirs = visit(path, d, fetch(path, d))
+            yield from results
+            stack.extend(reversed(subdirs))
+        return
+
+    window = 4 * workers
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        # the next directory to visit is at the end of the stack
+        stack = [[root, data, None]]
+        while stack:
+            for item in stack[:-window - 1:-1]:
+                if item[2] is None:
+                    item[2] = executor.submit(fetch, item[0], item[1])
+            path, d, future = stack.pop()
+            results, subdirs = visit(path, d, future.result())
+            yield from results
+            stack.extend([p, dd, None] for p, dd in reversed(subdirs))
+    finally:
+        for item in stack:
+            if item[2] is not None:
+                item[2].cancel()
+        executor.shutdown(wait=False)
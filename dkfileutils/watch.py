@@ -0,0 +1,323 @@
+"""Watch a directory tree for changes using Linux' inotify (through
+   :mod:`ctypes`, so there are no extra dependencies).
+
+   A :class:`Watcher` keeps a :class:`~dkfileutils.manifest.Manifest` of the
+   watched files up to date as change events arrive, so the cost of each
+   update is proportional to the number of events rather than the size of
+   the tree.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import stat
+import struct
+import sys
+
+from .filehash import ALGORITHM, CHUNKSIZE, file_digest
+from .globber import compile_glob
+from .listfiles import SkipRules
+from .manifest import Changes, FileRecord, Manifest
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+#: the events that are watched in every directory.
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF |
+              IN_ONLYDIR)
+
+_EVENT = struct.Struct('iIII')
+_libc = None
+
+
+def _inotify():
+    """Return the C library, with the inotify functions.
+    """
+    global _libc
+    if _libc is None:
+        if not sys.platform.startswith('linux'):
+            raise NotImplementedError("inotify is only available on Linux")
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6',
+                            use_errno=True)
+    return _libc
+
+
+def _check(res):
+    if res < 0:
+        err = ctypes.get_errno()
+        raise OSError(err, os.strerror(err))
+    return res
+
+
+def _join(reldir, name):
+    return reldir + '/' + name if reldir else name
+
+
+class Watcher:
+    """Watch the files in `root` that would be listed by
+       :func:`~dkfileutils.listfiles.list_files` (using `skiprules`), or
+       that match `glob` if it is given.
+
+       Iterating over a watcher yields a :class:`~dkfileutils.manifest.Changes`
+       for each batch of changes, while :meth:`digest` returns the current
+       digest of all the watched files.
+
+       Usage::
+
+           with Watcher('src') as w:
+               for changes in w:
+                   rebuild(changes.added + changes.modified)
+    """
+    def __init__(self, root, glob=None, skiprules=None, algorithm=ALGORITHM,
+                 latency=0.05, chunksize=CHUNKSIZE):
+        self.root = str(root)
+        self.algorithm = algorithm
+        self.chunksize = chunksize
+        #: seconds to wait for more events before processing a batch.
+        self.latency = latency
+        if glob is not None:
+            self._pattern = compile_glob(glob)
+            self._rules = None
+        else:
+            self._pattern = None
+            self._rules = skiprules or SkipRules.from_skipfile(self.root)
+        self._libc = _inotify()
+        self.fd = _check(self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC))
+        self._wds = {}      # wd -> reldir
+        self._reldirs = {}  # reldir -> wd
+        try:
+            relpaths = self._add_tree('')
+        except OSError:
+            self.close()
+            raise
+        #: the current state of the watched files.
+        self.manifest = Manifest.scan(self.root, relpaths, chunksize=chunksize,
+                                      algorithm=algorithm)
+        self.manifest.merkle()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __iter__(self):
+        return self.batches()
+
+    def close(self):
+        """Stop watching.
+        """
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def digest(self):
+        """Return the current digest of the watched files.
+        """
+        return self.manifest.aggregate()
+
+    def _keep_dir(self, name, reldir):
+        if self._rules is None:
+            return not name.startswith('.')
+        return self._rules.keep_dir(name, reldir)
+
+    def _keep_file(self, relpath):
+        name = relpath.rpartition('/')[2]
+        if self._rules is None:
+            return not name.startswith('.') and self._pattern.match(relpath)
+        return self._rules.keep_file(name, relpath)
+
+    def _add_watch(self, reldir):
+        path = os.path.join(self.root, reldir) if reldir else self.root
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path),
+                                          WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return False    # removed before we got to it
+            # e.g. ENOSPC (fs.inotify.max_user_watches) or EACCES: the
+            # subtree would silently be missing from the manifest.
+            raise OSError(err, os.strerror(err), path)
+        self._wds[wd] = reldir
+        self._reldirs[reldir] = wd
+        return True
+
+    def _add_tree(self, reldir):
+        """Watch `reldir` and all its (interesting) subdirectories.
+           Returns the relative names of the interesting files.
+        """
+        res = []
+        stack = [reldir]
+        while stack:
+            d = stack.pop()
+            if d in self._reldirs or not self._add_watch(d):
+                continue
+            try:
+                with os.scandir(os.path.join(self.root, d)) as it:
+                    entries = list(it)
+            except OSError:
+                continue
+            for entry in entries:
+                relpath = _join(d, entry.name)
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    if not entry.is_symlink() and \
+                            self._keep_dir(entry.name, relpath):
+                        stack.append(relpath)
+                elif self._keep_file(relpath):
+                    res.append(relpath)
+        return res
+
+    def _remove_tree(self, reldir):
+        """Stop watching `reldir` and its subdirectories.  Returns the
+           relative names of the files that were below it.
+        """
+        prefix = reldir + '/' if reldir else ''
+        for d in [d for d in self._reldirs
+                  if d == reldir or d.startswith(prefix)]:
+            wd = self._reldirs.pop(d)
+            del self._wds[wd]
+            if self.fd is not None:
+                self._libc.inotify_rm_watch(self.fd, wd)
+        return self.manifest.subtree(reldir)
+
+    def _read_events(self):
+        """Read all pending events.
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos < len(buf):
+                wd, mask, _cookie, size = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                name = os.fsdecode(buf[pos:pos + size].rstrip(b'\0'))
+                pos += size
+                events.append((wd, mask, name))
+
+    def _wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        return bool(readable)
+
+    def poll(self, timeout=0):
+        """Wait up to `timeout` seconds (forever if None) for changes, and
+           return them as a :class:`~dkfileutils.manifest.Changes` (which is
+           empty if nothing changed).
+        """
+        if self.fd is None or not self._wait(timeout):
+            return Changes([], [], [])
+        events = self._read_events()
+        while self.latency and self._wait(self.latency):
+            events += self._read_events()
+        return self._process(events)
+
+    def batches(self, timeout=None):
+        """Yield the changes as they happen.  Stops if nothing changed for
+           `timeout` seconds (never if `timeout` is None), or when the root
+           directory is removed.
+        """
+        while self.fd is not None:
+            changes = self.poll(timeout)
+            if changes:
+                yield changes
+            elif timeout is not None:
+                return
+
+    def _process(self, events):
+        """Update the manifest from `events` and return the changes.
+        """
+        goners = []
+        newdirs = []
+        files = set()
+        overflow = False
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            reldir = self._wds.get(wd)
+            if reldir is None:
+                continue
+            if mask & IN_IGNORED:
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                goners.append(reldir)
+                continue
+            relpath = _join(reldir, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    goners.append(relpath)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    newdirs.append(relpath)
+            else:
+                files.add(relpath)
+
+        before = {}
+        if overflow:
+            # events were lost, start over.
+            goners = ['']
+            newdirs = ['']
+        for reldir in goners:
+            for relpath in self._remove_tree(reldir):
+                before.setdefault(relpath, self.manifest.files.get(relpath))
+                self.manifest.update(relpath, None)
+        if '' in goners and not overflow:
+            self.close()    # the root directory is gone
+        for reldir in newdirs:
+            if self.fd is None:
+                break
+            name = reldir.rpartition('/')[2]
+            if reldir and not self._keep_dir(name, reldir):
+                continue
+            files.update(self._add_tree(reldir))
+
+        for relpath in files:
+            if relpath.rpartition('/')[0] not in self._reldirs or \
+                    not self._keep_file(relpath):
+                continue
+            before.setdefault(relpath, self.manifest.files.get(relpath))
+            self.manifest.update(relpath, self._record(relpath))
+
+        added, removed, modified = [], [], []
+        for relpath, old in before.items():
+            new = self.manifest.files.get(relpath)
+            if old is None and new is not None:
+                added.append(relpath)
+            elif old is not None and new is None:
+                removed.append(relpath)
+            elif old is not None and old.digest != new.digest:
+                modified.append(relpath)
+        return Changes(sorted(added), sorted(removed), sorted(modified))
+
+    def _record(self, relpath):
+        """Return a new record for `relpath`, or None if it is no longer a
+           file.
+        """
+        fname = os.path.join(self.root, relpath)
+        try:
+            st = os.stat(fname)
+            if stat.S_ISDIR(st.st_mode):
+                return None
+            digest = file_digest(fname, self.chunksize, self.algorithm)
+        except OSError:
+            return None
+        return FileRecord(st.st_size, st.st_mtime_ns, st.st_ino, digest)
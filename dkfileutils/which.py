@@ -1,10 +1,24 @@
 # -*- coding: utf-8 -*-
 """Print where on the path an executable is located.
+
+   On POSIX, each directory on the path is probed for the name directly.
+   On Windows, where ``PATHEXT`` means a name can match several files, the
+   contents of the directories on the path are indexed once and re-used
+   until a directory is modified.  Set the environment variable
+   ``DKFILEUTILS_WHICH_CACHE`` to a file name to keep the index between
+   processes.
 """
 from __future__ import print_function
+import argparse
+import json
 import sys
 import os
-from stat import ST_MODE, S_IXUSR, S_IXGRP, S_IXOTH
+from stat import ST_MODE, S_ISREG, S_IXUSR, S_IXGRP, S_IXOTH
+
+from .profiling import add_profile_argument, profile_env, profiled
+
+#: environment variable naming the file the index is persisted to.
+CACHE_ENV = 'DKFILEUTILS_WHICH_CACHE'
 
 
 def get_executable(name):
@@ -32,6 +46,20 @@ def is_executable(fname):
     return os.stat(fname)[ST_MODE] & (S_IXUSR | S_IXGRP | S_IXOTH)
 
 
+def _probe(filename):
+    """Yield the executable regular files named `filename` in the
+       directories on the path (one stat per directory).
+    """
+    for pth in get_path_directories():
+        fname = os.path.join(pth, filename)
+        try:
+            mode = os.stat(fname).st_mode
+        except OSError:
+            continue
+        if S_ISREG(mode) and mode & (S_IXUSR | S_IXGRP | S_IXOTH):
+            yield fname
+
+
 def _listdir(pth, extensions):
     """Non-raising listdir."""
     try:
@@ -45,6 +73,114 @@ def _normalize(pth):
     return os.path.normcase(os.path.normpath(pth))
 
 
+def _mtime(pth):
+    try:
+        return os.stat(pth).st_mtime_ns
+    except OSError:
+        return None
+
+
+class PathIndex:
+    """An index of the files (with an executable extension) in the
+       directories on the path, mapping names (with and without extension)
+       to the ordered list of ``(directory number, filename)`` where they
+       can be found.
+
+       `listings` maps a directory to ``[mtime_ns, filenames]`` and is
+       shared with the on-disk cache.
+    """
+    def __init__(self, dirs, extensions, listings=None):
+        self.dirs = dirs
+        self.extensions = extensions
+        self.listings = listings if listings is not None else {}
+        self._index = None
+
+    def refresh(self):
+        """Re-list the directories that have been modified since they were
+           indexed.  Returns True if anything changed.
+        """
+        changed = False
+        for pth in self.dirs:
+            mtime = _mtime(pth)
+            listing = self.listings.get(pth)
+            if listing is not None and listing[0] == mtime:
+                continue
+            fnames = _listdir(pth, self.extensions) if mtime else None
+            self.listings[pth] = [mtime, fnames or []]
+            changed = True
+        if changed:
+            self._index = None
+        return changed
+
+    def _build(self):
+        index = {}
+        for i, pth in enumerate(self.dirs):
+            for fname in self.listings[pth][1]:
+                name, ext = os.path.splitext(fname)
+                index.setdefault(fname, []).append((i, fname))
+                if ext and ext.lower() in self.extensions:
+                    index.setdefault(name, []).append((i, fname))
+        return index
+
+    def lookup(self, filename):
+        """Return the full names of the files that match `filename`, in
+           path order (and sorted within each directory).
+        """
+        if self._index is None:
+            self._index = self._build()
+        name = os.path.splitext(filename)[0]
+        hits = set(self._index.get(filename, ()))
+        hits.update(self._index.get(name, ()))
+        return [os.path.join(self.dirs[i], fname) for i, fname in sorted(hits)]
+
+
+_indexes = {}
+
+
+def _read_cache(fname, extensions):
+    try:
+        with open(fname) as fp:
+            data = json.load(fp)
+    except (IOError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get('extensions') != extensions:
+        return {}
+    return data.get('dirs', {})
+
+
+def _write_cache(fname, extensions, listings):
+    tmp = '%s.%d.tmp' % (fname, os.getpid())
+    try:
+        with open(tmp, 'w') as fp:
+            json.dump({'extensions': extensions, 'dirs': listings}, fp)
+        os.replace(tmp, fname)
+    except OSError:  # pragma: nocover
+        pass
+
+
+def path_index(extensions):
+    """Return the (up to date) :class:`PathIndex` for the current path and
+       `extensions`.
+    """
+    dirs = get_path_directories()
+    key = (tuple(dirs), tuple(extensions))
+    index = _indexes.get(key)
+    cachefile = os.environ.get(CACHE_ENV)
+    if index is None:
+        listings = _read_cache(cachefile, extensions) if cachefile else {}
+        index = _indexes[key] = PathIndex(dirs, extensions, listings)
+    if index.refresh() and cachefile:
+        _write_cache(cachefile, extensions, index.listings)
+    return index
+
+
+def clear_cache():
+    """Forget the in-process path indexes.
+    """
+    _indexes.clear()
+
+
+@profile_env
 def which(filename, interactive=False, verbose=False):
     """Yield all executable files on path that matches `filename`.
     """
@@ -57,36 +193,21 @@ def which(filename, interactive=False, verbose=False):
     if has_extension and ext.lower() not in exe:
         raise ValueError("which can only search for executable files")
 
-    def match(filenames):
-        """Returns the sorted subset of ``filenames`` that matches
-           ``filename``.
-        """
-        res = set()
-        for fname in filenames:
-            if fname == filename:  # pragma: nocover
-                res.add(fname)  # exact match
-                continue
-            fname_name, ext = os.path.splitext(fname)
-            if fname_name == name and ext.lower() in exe:  # pragma: nocover
-                res.add(fname)
-        return sorted(res)
+    if sys.platform == 'win32':  # pragma: nocover
+        candidates = (fname for fname in path_index(exe).lookup(filename)
+                      if is_executable(fname))
+    else:
+        candidates = _probe(filename)
 
     returnset = set()
     found = False
-    for pth in get_path_directories():
-        if verbose:  # pragma: nocover
-            print('checking pth..')
-
-        fnames = _listdir(pth, exe)
-        if not fnames:
-            continue
-
-        for m in match(fnames):
-            found_file = _normalize(os.path.join(pth, m))
-            if found_file not in returnset:  # pragma: nocover
-                if is_executable(found_file):
-                    yield found_file
-                returnset.add(found_file)
+    if verbose:  # pragma: nocover
+        print('checking path..')
+    for fname in candidates:
+        found_file = _normalize(fname)
+        if found_file not in returnset:
+            yield found_file
+            returnset.add(found_file)
         found = True
 
     if not found and interactive:  # pragma: nocover
@@ -94,8 +215,25 @@ def which(filename, interactive=False, verbose=False):
         sys.exit(1)
 
 
-if __name__ == "__main__":  # pragma: nocover
-    _args = sys.argv
-    for _fname in which(_args[1], interactive=True, verbose='-v' in _args):
-        print(_fname)
+def main():  # pragma: nocover
+    """Print all the executables on the path that match the name.
+    """
+    p = argparse.ArgumentParser(
+        description="Print where on the path an executable is located."
+    )
+    p.add_argument('name', help="The executable to look for.")
+    p.add_argument(
+        '--verbose', '-v', action='store_true',
+        help="Increase verbosity."
+    )
+    add_profile_argument(p)
+    args = p.parse_args()
+
+    with profiled(args.profile):
+        for fname in which(args.name, interactive=True, verbose=args.verbose):
+            print(fname)
     sys.exit(0)
+
+
+if __name__ == "__main__":  # pragma: nocover
+    main()
@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
-from hashlib import md5
+from hashlib import md5, blake2b
+
+import pytest
 from yamldirs import create_files
 from dkfileutils import changed, path
 from dkfileutils.changed import Directory
+from dkfileutils.stats import Stats
 
 
 def test_empty_digest():
@@ -86,3 +89,251 @@ def test_multifiles():
     with create_files(files) as directory:
         assert changed.changed('a')
         assert not Directory('a').changed()
+
+
+def test_changed_manifest():
+    files = """
+        a:
+            - b: hello
+            - c: world
+    """
+    with create_files(files) as directory:
+        assert changed.changed('a')
+        assert not changed.changed('a')
+        with open(os.path.join('a', 'c'), 'w') as fp:
+            fp.write('there')
+        assert changed.changed('a')
+        assert not changed.changed('a')
+        os.unlink(os.path.join('a', 'b'))
+        assert changed.changed('a')
+        assert not changed.changed('a')
+
+
+def test_changed_legacy_cachefile():
+    files = """
+        a:
+            - .md5: d41d8cd98f00b204e9800998ecf8427e
+            - b: hello
+    """
+    with create_files(files) as directory:
+        assert changed.changed('a')
+        assert not changed.changed('a')
+
+
+def test_digest_workers():
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: world
+            - e: ''
+    """
+    with create_files(files) as directory:
+        assert changed.digest('a', workers=4) == changed.digest('a')
+        assert changed.digest('a', glob='**/*', workers=4) == \
+            changed.digest('a', glob='**/*')
+        assert changed.changed('a', workers=4)
+        assert not changed.changed('a', workers=4)
+
+
+def test_changed_algorithm():
+    files = """
+        a:
+            - b: hello
+    """
+    with create_files(files) as directory:
+        assert changed.digest('a', algorithm='blake2b') == \
+            blake2b(b'hello').hexdigest()
+        assert changed.changed('a')
+        assert not changed.changed('a')
+        # switching algorithm invalidates the cache
+        assert changed.changed('a', algorithm='blake2b')
+        assert not changed.changed('a', algorithm='blake2b')
+        assert Directory('a').changed(algorithm='sha1')
+        assert not Directory('a').changed(algorithm='sha1')
+
+
+def test_digest_merkle():
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: world
+    """
+    with create_files(files) as directory:
+        d = changed.digest('a', merkle=True)
+        assert d == changed.digest('a', merkle=True)
+        assert d != changed.digest('a')
+        assert changed.changed('a')
+        assert not changed.changed('a')
+        with open(os.path.join('a', 'c', 'd'), 'w') as fp:
+            fp.write('there')
+        assert changed.digest('a', merkle=True) != d
+        assert changed.changed('a')
+
+
+def test_changed_odd_names():
+    files = """
+        a:
+            - b: hello
+    """
+    with create_files(files) as directory:
+        for name in ('x\x0cy', 'r\rs', 'l\u2028m', 'n\nm'):
+            with open(os.path.join('a', name), 'w') as fp:
+                fp.write(name)
+        assert [changed.changed('a') for _ in range(3)] == \
+            [True, False, False]
+
+
+def test_non_utf8_names():
+    files = """
+        a:
+            - b: hello
+    """
+    with create_files(files) as directory:
+        with open(os.path.join(b'a', b'b\xffc'), 'w') as fp:
+            fp.write('world')
+        d = changed.digest('a', merkle=True)
+        assert d == changed.digest('a', merkle=True)
+        assert changed.tree_digest('a', processes=2) == \
+            changed.tree_digest('a')
+        assert [changed.changed('a') for _ in range(3)] == \
+            [True, False, False]
+        assert changed.changes('a') == ([], [], [])
+
+
+def test_tree_digest():
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: beautiful
+                - e: world
+            - f: ''
+    """
+    with create_files(files) as directory:
+        d = changed.tree_digest('a')
+        for processes in (1, 2, 4):
+            assert changed.tree_digest('a', processes=processes) == d
+        assert changed.digest('a', processes=2) == d
+        assert d != changed.digest('a')
+
+        # files split into several ranges
+        small = changed.tree_digest('a', rangesize=4)
+        assert small != d
+        for processes in (None, 2, 3):
+            assert changed.tree_digest('a', processes=processes,
+                                       rangesize=4) == small
+        assert changed.tree_digest('a', glob='c/*', rangesize=4,
+                                   processes=2) == \
+            changed.tree_digest('a', glob='c/*', rangesize=4)
+
+        stats = Stats()
+        changed.tree_digest('a', rangesize=4, stats=stats)
+        assert stats.files_opened == 3  # the empty file isn't read
+        assert stats.bytes_hashed == 19
+
+        with open(os.path.join('a', 'c', 'e'), 'w') as fp:
+            fp.write('there')
+        assert changed.tree_digest('a', rangesize=4, processes=2) != small
+
+
+def test_changes():
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: world
+                - e: foo
+    """
+    with create_files(files) as directory:
+        first = changed.changes('a')
+        assert first.added == ['b', 'c/d', 'c/e']
+        assert not first.removed and not first.modified
+        assert not changed.changes('a')
+
+        with open(os.path.join('a', 'c', 'd'), 'w') as fp:
+            fp.write('there')
+        os.unlink(os.path.join('a', 'b'))
+        with open(os.path.join('a', 'f'), 'w') as fp:
+            fp.write('new')
+        delta = changed.changes('a')
+        assert delta == changed.Changes(['f'], ['b'], ['c/d'])
+        assert delta
+        assert not changed.changed('a')
+
+
+def test_changes_glob():
+    files = """
+        a:
+            - b.txt: hello
+            - c.rst: world
+    """
+    with create_files(files) as directory:
+        adir = Directory('a')
+        assert adir.changes(glob='*.txt').added == ['b.txt']
+        with open(os.path.join('a', 'c.rst'), 'a') as fp:
+            fp.write('!')
+        assert not adir.changes(glob='*.txt')
+        assert adir.changes(glob='*.rst').added == ['c.rst']
+
+
+def test_changes_missing():
+    assert not changed.changes("this-directory-doesnt-exist")
+
+
+def test_changed_many():
+    files = """
+        a:
+            - b.js: hello
+            - c:
+                - d.less: world
+                - e.js: foo
+            - f.txt: bar
+    """
+    with create_files(files) as directory:
+        adir = Directory('a')
+        globs = {'js': '**/*.js', 'less': '**/*.less', 'all': '**/*'}
+        assert adir.changed_many(globs) == {'js': True, 'less': True, 'all': True}
+        assert adir.changed_many(globs) == {'js': False, 'less': False, 'all': False}
+
+        # shares the manifest files with Directory.changed()
+        assert not adir.changed(glob='**/*.js')
+
+        with open(os.path.join('a', 'c', 'e.js'), 'a') as fp:
+            fp.write('!')
+        assert adir.changed_many(globs) == {'js': True, 'less': False, 'all': True}
+        assert not adir.changed(glob='**/*.less')
+
+
+def test_changed_many_hashes_once(monkeypatch):
+    files = """
+        a:
+            - b.js: hello
+            - c.less: world
+    """
+    with create_files(files) as directory:
+        hashed = []
+        file_digest = changed.file_digest
+
+        def counting_digest(fname, *args):
+            hashed.append(os.path.basename(fname))
+            return file_digest(fname, *args)
+
+        monkeypatch.setattr(changed, 'file_digest', counting_digest)
+        changed.changed_many('a', {'x': '**/*', 'y': '*.less', 'z': '*.js'})
+        assert sorted(hashed) == ['b.js', 'c.less']
+
+
+def test_changed_many_missing():
+    assert changed.changed_many('this-directory-doesnt-exist', {'x': '*'}) == {'x': True}
+
+
+def test_changed_many_filename_collision():
+    files = """
+        a:
+            - b.js: hello
+    """
+    with create_files(files) as directory:
+        with pytest.raises(ValueError):
+            changed.changed_many('a', {'x': '**/*.js', 'y': '*.js'})
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import hashlib
+from hashlib import md5
+
+import pytest
+from yamldirs import create_files
+
+from dkfileutils.filehash import (
+    combine_ranges, file_digest, file_ranges, hash_ranges, new_hasher,
+    range_digest, update_from_file, update_from_files, threaded_map
+)
+
+
+def test_file_digest():
+    files = """
+        a: hello world
+        empty: ''
+    """
+    with create_files(files) as _root:
+        assert file_digest('a') == md5(b'hello world').hexdigest()
+        assert file_digest('empty') == md5(b'').hexdigest()
+
+
+def test_small_chunks():
+    files = """
+        a: hello world
+    """
+    with create_files(files) as _root:
+        for chunksize in (1, 2, 3, 5, 11, 12, 1024):
+            assert file_digest('a', chunksize) == md5(b'hello world').hexdigest()
+
+
+def test_update_from_file():
+    files = """
+        a: hello
+        b: world
+    """
+    with create_files(files) as _root:
+        h = md5()
+        update_from_file(h, 'a', 2)
+        update_from_file(h, 'b', 2)
+        assert h.hexdigest() == md5(b'helloworld').hexdigest()
+
+
+def test_threaded_map():
+    assert list(threaded_map(abs, range(-50, 0), workers=4)) == list(range(50, 0, -1))
+    assert list(threaded_map(abs, [-1, -2])) == [1, 2]
+
+
+def test_update_from_files_workers():
+    files = """
+        a: hello
+        b: beautiful
+        c: ''
+        d: world
+    """
+    with create_files(files) as _root:
+        fnames = ['a', 'b', 'c', 'd']
+        expected = md5(b'hellobeautifulworld').hexdigest()
+        for workers in (None, 1, 2, 8):
+            for chunksize in (1, 4, 1024):
+                h = update_from_files(md5(), fnames, chunksize, workers)
+                assert h.hexdigest() == expected
+
+
+def test_algorithm():
+    files = """
+        a: hello world
+    """
+    with create_files(files) as _root:
+        for algorithm in ('md5', 'sha1', 'sha256', 'blake2b'):
+            expected = hashlib.new(algorithm, b'hello world').hexdigest()
+            assert file_digest('a', algorithm=algorithm) == expected
+
+
+def test_new_hasher():
+    assert new_hasher().name == 'md5'
+    assert new_hasher('blake2b').name == 'blake2b'
+    with pytest.raises(ValueError):
+        new_hasher('shake_128')
+    with pytest.raises(ValueError):
+        new_hasher('no-such-algorithm')
+
+
+def test_file_ranges():
+    assert file_ranges(0, 4) == []
+    assert file_ranges(3, 4) == [(0, 3)]
+    assert file_ranges(8, 4) == [(0, 4), (4, 4)]
+    assert file_ranges(9, 4) == [(0, 4), (4, 4), (8, 1)]
+
+
+def test_range_digest():
+    files = """
+        a: hello world
+    """
+    with create_files(files) as _root:
+        assert range_digest('a', 0, 5) == md5(b'hello').digest()
+        assert range_digest('a', 6, 100, chunksize=2) == \
+            md5(b'world').digest()
+        assert hash_ranges([('a', 0, 5), ('a', 5, 6)]) == [
+            md5(b'hello').digest(), md5(b' world').digest()
+        ]
+        assert combine_ranges(11, [md5(b'hello world').digest()]) == \
+            md5(b'file 11\0' + md5(b'hello world').digest()).digest()
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import sys
+
+import pytest
+from yamldirs import create_files
+
+from dkfileutils import globber
+from dkfileutils.globber import (
+    GlobPattern, GlobSet, compile_glob, iter_glob, iter_matches, translate
+)
+
+
+def _rel(root, fnames):
+    return [os.path.relpath(f, root).replace(os.sep, '/') for f in fnames]
+
+
+def test_translate():
+    assert translate('*.py') == r'[^/]*\.py'
+    assert translate('**/a?') == r'(?:.*/)?a[^/]'
+    assert translate('[!a]b') == r'[^a]b'
+    assert translate('a/**') == r'a/(?:.*/)?[^/]*'
+
+
+def test_match():
+    pat = GlobPattern('**/*.js')
+    assert pat.match('a.js')
+    assert pat.match('a/b/c.js')
+    assert not pat.match('a/b/c.jsx')
+    assert GlobPattern('a/*.js').match('a/b.js')
+    assert not GlobPattern('a/*.js').match('a/b/c.js')
+    assert GlobPattern('!a/*.js').match('a/b/c.js')
+    assert not GlobPattern('!a/*.js').match('a/b.js')
+
+
+def test_compile_glob_cached():
+    assert compile_glob('**/*.py') is compile_glob('**/*.py')
+
+
+def test_segments():
+    assert GlobPattern('a/**/b').segments[1] is globber.GLOBSTAR
+    assert GlobPattern('a/**').segments[1] is globber.GLOBSTAR
+    assert GlobPattern('a/**').match('a/b/c')
+    assert GlobPattern('a**/b').segments is None
+
+
+def test_iter_glob():
+    files = """
+        - a.py
+        - .b.py
+        - .c:
+            - d.py
+        - e:
+            - f.py
+            - g:
+                - h.py
+                - i.js
+    """
+    with create_files(files) as root:
+        assert _rel(root, iter_glob(root, '**/*.py')) == [
+            'a.py', 'e/f.py', 'e/g/h.py'
+        ]
+        assert _rel(root, iter_glob(root, 'e/**/*.js')) == ['e/g/i.js']
+        assert _rel(root, iter_glob(root, 'e/g/h.py')) == ['e/g/h.py']
+        assert _rel(root, iter_glob(root, '.c/d.py')) == []
+        assert _rel(root, iter_glob(root, 'e/g')) == []
+        assert _rel(root, iter_glob(root, 'a**/f.py')) == []
+        assert _rel(root, iter_glob(root, 'e**/f.py')) == ['e/f.py']
+        assert _rel(root, iter_glob(root, '!**/*.py')) == ['e/g/i.js']
+        assert _rel(root, iter_glob(os.path.join(root, 'missing'), '*')) == []
+
+
+def _casefold(monkeypatch, value):
+    monkeypatch.setattr(globber, 'CASEFOLD', value)
+    globber.compile_glob.cache_clear()
+    globber.compile_globset.cache_clear()
+
+
+def test_casefold(monkeypatch):
+    files = """
+        - Site.LESS
+        - Lib:
+            - Base.Less
+            - other.css
+    """
+    with create_files(files) as root:
+        try:
+            _casefold(monkeypatch, True)
+            assert sorted(_rel(root, iter_glob(root, '**/*.less'))) == [
+                'Lib/Base.Less', 'Site.LESS'
+            ]
+            assert _rel(root, iter_glob(root, ['**/*.LESS', '!lib/**'])) == [
+                'Site.LESS'
+            ]
+            assert sorted(rel for _f, rel, _i in iter_matches(root, ['*/*'])) \
+                == ['lib/base.less', 'lib/other.css']
+            assert compile_glob('**/*.less').match('Lib/Base.LESS')
+
+            _casefold(monkeypatch, False)
+            assert _rel(root, iter_glob(root, '**/*.less')) == []
+        finally:
+            globber.compile_glob.cache_clear()
+            globber.compile_globset.cache_clear()
+
+
+@pytest.mark.skipif(sys.platform != 'win32', reason="Windows only")
+def test_casefold_windows():
+    files = """
+        - Site.LESS
+        - Lib:
+            - Base.Less
+    """
+    with create_files(files) as root:
+        assert globber.CASEFOLD
+        assert sorted(_rel(root, iter_glob(root, '**/*.less'))) == [
+            'Lib/Base.Less', 'Site.LESS'
+        ]
+        assert len(list(iter_glob(root, 'lib/base.less'))) == 1
+        assert len(list(iter_glob(root, 'LIB/BASE.LESS'))) == 1
+
+
+def test_iter_glob_prunes(monkeypatch):
+    files = """
+        - a:
+            - b:
+                - c.css
+                - d.js
+        - x:
+            - y:
+                - z.css
+    """
+    with create_files(files) as root:
+        scanned = []
+        scandir = os.scandir
+
+        def tracking_scandir(path):
+            scanned.append(os.path.relpath(path, root).replace(os.sep, '/'))
+            return scandir(path)
+
+        with monkeypatch.context() as m:
+            m.setattr(os, 'scandir', tracking_scandir)
+            assert _rel(root, iter_glob(root, 'a/b/*.css')) == ['a/b/c.css']
+            assert scanned == ['a/b']
+
+            del scanned[:]
+            assert _rel(root, iter_glob(root, 'a/**/*.css')) == ['a/b/c.css']
+            assert scanned == ['a', 'a/b']
+
+
+def test_iter_matches():
+    files = """
+        - a.py
+        - b:
+            - c.js
+            - d.py
+        - e:
+            - f.txt
+    """
+    with create_files(files) as root:
+        res = sorted((relpath, indices) for _fname, relpath, indices
+                     in iter_matches(root, ['**/*.py', 'b/*', '!**/*.js']))
+        assert res == [
+            ('a.py', (0, 2)),
+            ('b/c.js', (1,)),
+            ('b/d.py', (0, 1, 2)),
+            ('e/f.txt', (2,)),
+        ]
+
+
+def test_globset_match():
+    gs = GlobSet(['**/*.js', '!vendor/**', 'vendor/keep.js'])
+    assert gs.match('a.js')
+    assert gs.match('a/b.js')
+    assert not gs.match('a.py')
+    assert not gs.match('vendor/x.js')
+    assert not gs.match('vendor/a/x.js')
+    assert gs.match('vendor/keep.js')
+    assert GlobSet(['!*.py']).match('a.js')
+    assert not GlobSet(['!*.py']).match('a.py')
+    assert not GlobSet([]).match('a.py')
+
+
+def test_iter_glob_patterns(monkeypatch):
+    files = """
+        - a.js
+        - b.py
+        - lib:
+            - c.js
+        - vendor:
+            - keep.js
+            - d.js
+            - sub:
+                - e.js
+        - node_modules:
+            - f:
+                - g.js
+    """
+    with create_files(files) as root:
+        scanned = []
+        scandir = os.scandir
+
+        def tracking_scandir(path):
+            scanned.append(os.path.relpath(path, root).replace(os.sep, '/'))
+            return scandir(path)
+
+        with monkeypatch.context() as m:
+            m.setattr(os, 'scandir', tracking_scandir)
+            assert sorted(_rel(root, iter_glob(root, [
+                '**/*.js', '!vendor/**', '!node_modules/**'
+            ]))) == ['a.js', 'lib/c.js']
+            assert sorted(scanned) == ['.', 'lib']
+
+            del scanned[:]
+            assert sorted(_rel(root, iter_glob(root, [
+                '**/*.js', '!vendor/**', 'vendor/keep.js', '!node_modules/**'
+            ]))) == ['a.js', 'lib/c.js', 'vendor/keep.js']
+            assert sorted(scanned) == ['.', 'lib']
+
+            del scanned[:]
+            assert sorted(_rel(root, iter_glob(root, [
+                '!node_modules/**', '!**/*.js'
+            ]))) == ['b.py']
+            assert 'node_modules' not in scanned
+
+            assert sorted(_rel(root, iter_glob(root, [
+                '**/*.js', '!vendor/*.js'
+            ]))) == [
+                'a.js', 'lib/c.js', 'node_modules/f/g.js', 'vendor/sub/e.js'
+            ]
@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
+from hashlib import sha256
 
-from dkfileutils.listfiles import list_files, read_skipfile
+from dkfileutils.listfiles import list_files, read_skipfile, SkipRules
 from yamldirs import create_files
 
 BASEDIR = os.path.dirname(__file__)
@@ -69,4 +70,104 @@ def test_listfiles():
     """
     with create_files(files) as directory:
         assert set(list_files(digest=False)) == {'a', 'b', 'c'}
-        
+
+
+def test_listfiles_workers():
+    files = """
+       - a: hello
+       - b:
+           - c: beautiful
+           - d: world
+       - e: ''
+    """
+    with create_files(files) as directory:
+        assert list(list_files(workers=4)) == list(list_files())
+
+
+def test_listfiles_algorithm():
+    files = """
+       - a: hello
+    """
+    with create_files(files) as directory:
+        assert list(list_files(algorithm='sha256')) == [
+            (sha256(b'hello').hexdigest(), 'a')
+        ]
+
+
+def test_listfiles_order():
+    files = """
+       - a:
+           - b:
+               - c: 1
+           - d: 2
+           - node_modules:
+               - e: 3
+       - f: 4
+       - g.egg-info:
+           - h: 5
+       - i.egg-info:
+           - j: 6
+    """
+    with create_files(files) as directory:
+        expected = []
+        for root, dirs, fnames in os.walk('.'):
+            dirs[:] = [d for d in dirs
+                       if d != 'node_modules' and not d.endswith('.egg-info')]
+            rel = os.path.relpath(root, '.').replace(os.sep, '/')
+            expected += [fname if rel == '.' else rel + '/' + fname
+                         for fname in fnames]
+        assert list(list_files(digest=False)) == expected
+        assert set(expected) == {'a/b/c', 'a/d', 'f'}
+
+
+def test_skiprules():
+    rules = SkipRules(['a/b', '**/*.log', 'c/?.py', 'd/[!x]*', '# comment', ''])
+    assert not rules.keep_file('b', 'a/b')
+    assert rules.keep_file('b', 'b')
+    assert not rules.keep_file('x.log', 'x.log')
+    assert not rules.keep_file('x.log', 'e/f/x.log')
+    assert not rules.keep_file('a.py', 'c/a.py')
+    assert rules.keep_file('ab.py', 'c/ab.py')
+    assert rules.keep_file('a.py', 'c/e/a.py')
+    assert not rules.keep_file('y', 'd/y')
+    assert rules.keep_file('x', 'd/x')
+    assert rules.keep_file('# comment', '# comment')
+    assert not rules.keep_file('foo.pyc', 'foo.pyc')
+    assert not rules.keep_file('.foo', '.foo')
+    assert not rules.keep_dir('node_modules', 'x/node_modules')
+    assert not rules.keep_dir('foo.egg-info', 'foo.egg-info')
+    assert not rules.keep_dir('b', 'a/b')
+    assert rules.keep_dir('c', 'c')
+
+
+def test_skipfile_dirs_and_globs():
+    files = """
+        - .skipfile: |
+            b
+            c/*.js
+        - a
+        - b:
+            - x
+        - c:
+            - d.js
+            - e.py
+            - f:
+                - g.js
+    """
+    with create_files(files) as directory:
+        assert sorted(list_files(digest=False)) == ['a', 'c/e.py', 'c/f/g.js']
+
+
+def test_listfiles_skiprules():
+    files = """
+        - a.py
+        - b.txt
+        - c:
+            - d.py
+        - Makefile
+    """
+    with create_files(files) as directory:
+        rules = SkipRules(skipfiles=['c'], skipexts=['.py'])
+        assert sorted(list_files(digest=False, skiprules=rules)) == [
+            'Makefile', 'b.txt'
+        ]
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+from hashlib import md5
+from yamldirs import create_files
+
+from dkfileutils.manifest import FileRecord, Manifest, MANIFEST_HEADER
+
+
+def test_scan():
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c/d'])
+        assert m.hashed == 2
+        assert sorted(m.files) == ['b', 'c/d']
+        assert m.files['b'].digest == md5(b'hello').hexdigest()
+        assert m.files['b'].size == 5
+
+
+def test_read_write():
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c/d'])
+        m.write('manifest')
+        m2 = Manifest.read('manifest')
+        assert m2 == m
+        assert m2.aggregate() == m.aggregate()
+        assert m2.timestamp_ns == os.stat('manifest').st_mtime_ns
+        assert sorted(os.listdir('.')) == ['a', 'manifest']  # no temp file
+
+
+def test_read_write_odd_names():
+    names = ['b\udcffc', 'x\x0cy', 'r\rs', 'p\x85q', 'l\u2028m',
+             'n\nm', 'back\\slash', 'd\\n/e\nf']
+    rec = FileRecord(5, 1, 2, md5(b'hello').hexdigest())
+    m = Manifest({name: rec for name in names})
+    with create_files("""
+        a: hello
+    """) as _root:
+        m.write('manifest')
+        m2 = Manifest.read('manifest')
+        assert m2 == m
+        assert m2.aggregate() == m.aggregate()
+        assert list(m.diff(m2)) == []
+
+
+def test_read_invalid():
+    files = """
+        legacy: d41d8cd98f00b204e9800998ecf8427e
+        broken: |
+            # dkfileutils manifest 1
+            not a record
+    """
+    with create_files(files) as _root:
+        assert Manifest.read('legacy') is None
+        assert Manifest.read('broken') is None
+        assert Manifest.read('missing') is None
+
+
+def test_only_changed_files_rehashed():
+    files = """
+        a:
+            b: hello
+            c: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c'])
+        m.timestamp_ns = os.stat('a/b').st_mtime_ns + 10**9
+        assert Manifest.scan('a', ['b', 'c'], m).hashed == 0
+
+        with open('a/c', 'a') as fp:
+            fp.write('!')
+        m2 = Manifest.scan('a', ['b', 'c'], m)
+        assert m2.hashed == 1
+        assert m2.files['c'].digest == md5(b'world!').hexdigest()
+        assert m2.aggregate() != m.aggregate()
+
+
+def test_racy_files_rehashed():
+    files = """
+        a: hello
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('.', ['a'])
+        m.timestamp_ns = os.stat('a').st_mtime_ns
+        assert Manifest.scan('.', ['a'], m).hashed == 1
+
+
+def test_header():
+    files = """
+        a: hello
+    """
+    with create_files(files) as _root:
+        Manifest.scan('.', ['a']).write('manifest')
+        with open('manifest') as fp:
+            assert fp.readline().strip() == MANIFEST_HEADER
+
+
+def test_algorithm():
+    files = """
+        a: hello
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('.', ['a'], algorithm='sha256')
+        m.write('manifest')
+        m2 = Manifest.read('manifest')
+        assert m2.algorithm == 'sha256'
+        assert m2 == m
+        m2.timestamp_ns = os.stat('a').st_mtime_ns + 10**9
+        assert Manifest.scan('.', ['a'], m2, algorithm='sha256').hashed == 0
+        # a different algorithm re-hashes everything
+        m3 = Manifest.scan('.', ['a'], m2, algorithm='md5')
+        assert m3.hashed == 1
+        assert m3.files['a'].digest == md5(b'hello').hexdigest()
+
+
+def test_merkle():
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+                e:
+                    f: foo
+            g:
+                h: bar
+    """
+    with create_files(files) as _root:
+        relpaths = ['b', 'c/d', 'c/e/f', 'g/h']
+        m = Manifest.scan('a', relpaths)
+        root = m.merkle()
+        assert root == m.aggregate()
+        assert sorted(m.dirs) == ['', 'c', 'c/e', 'g']
+
+        with open('a/c/e/f', 'w') as fp:
+            fp.write('changed')
+        m2 = Manifest.scan('a', relpaths, m)
+        m2.merkle(m)
+        assert m2.dirs['g'] == m.dirs['g']
+        assert m2.dirs['c/e'] != m.dirs['c/e']
+        assert m2.dirs['c'] != m.dirs['c']
+        assert m2.aggregate() != root
+
+        # the same as computing it from scratch
+        m3 = Manifest(dict(m2.files), algorithm=m2.algorithm)
+        assert m3.merkle() == m2.aggregate()
+        assert m3.dirs == m2.dirs
+
+
+def test_merkle_persisted():
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c/d'])
+        m.merkle()
+        m.write('manifest')
+        m2 = Manifest.read('manifest')
+        assert m2.dirs == m.dirs
+
+
+def test_merkle_empty():
+    assert Manifest().aggregate() == md5(b'').hexdigest()
+
+
+def test_diff(monkeypatch):
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+                e: foo
+            g:
+                h: bar
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c/d', 'c/e', 'g/h'])
+        assert list(m.diff(m)) == []
+
+        with open('a/c/e', 'w') as fp:
+            fp.write('changed')
+        with open('a/i', 'w') as fp:
+            fp.write('new')
+        m2 = Manifest.scan('a', ['c/d', 'c/e', 'g/h', 'i'], m)
+        assert sorted(m.diff(m2)) == ['b', 'c/e', 'i']
+        assert sorted(m2.diff(m)) == ['b', 'c/e', 'i']
+
+        # the directory index is not rebuilt for each comparison
+        def children(self):
+            raise AssertionError('index rebuilt')
+        monkeypatch.setattr(Manifest, '_children', children)
+        assert sorted(m.diff(m2)) == ['b', 'c/e', 'i']
+
+
+def test_changes():
+    files = """
+        a:
+            b: hello
+            c: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c'])
+        with open('a/c', 'w') as fp:
+            fp.write('changed')
+        with open('a/d', 'w') as fp:
+            fp.write('new')
+        m2 = Manifest.scan('a', ['c', 'd'])
+        ch = m.changes(m2)
+        assert ch == (['d'], ['b'], ['c'])
+        assert ch.added == ['d'] and ch.removed == ['b'] and ch.modified == ['c']
+        assert not m.changes(m)
+
+
+def test_manifest_update():
+    files = """
+        a:
+            b: hello
+            c:
+                d: world
+    """
+    with create_files(files) as _root:
+        m = Manifest.scan('a', ['b', 'c/d'])
+        m.merkle()
+        with open('a/c/e', 'w') as fp:
+            fp.write('new')
+        m.update('c/e', Manifest.scan('a', ['c/e']).files['c/e'])
+        m.update('c/d', None)
+        m.update('b', None)
+        fresh = Manifest(dict(m.files))
+        assert m.aggregate() == fresh.merkle()
+        assert m.dirs == fresh.dirs
+        m.update('c/e', None)
+        assert m.aggregate() == Manifest().aggregate()
+        assert m.subtree('') == []
+
+
+def test_subtree():
+    m = Manifest()
+    for relpath in ['a', 'b/c', 'b/d/e', 'f/g']:
+        m.update(relpath, FileRecord(0, 0, 0, md5(b'').hexdigest()))
+    assert sorted(m.subtree('b')) == ['b/c', 'b/d/e']
+    assert sorted(m.subtree('')) == ['a', 'b/c', 'b/d/e', 'f/g']
+    assert m.subtree('x') == []
@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+import copy
 import os
+import pickle
+import random
 import stat
 
 import time
@@ -392,6 +395,13 @@ def test_glob():
         assert [p.relpath(root) for p in root.glob('**/a.*')] == [
             'a.py', opjoin('b', 'a.txt')
         ]
+        assert [p.relpath(root) for p in root.glob(['**/*.txt', '!b/a*',
+                                                    'b/aa.txt'])] == [
+            opjoin('b', 'aa.txt')
+        ]
+        assert sorted(p.relpath(root) for p in root.glob(['*', '!a.py'])) == [
+            'd', 'f'
+        ]
 
 
 def test_subdirs():
@@ -566,6 +576,40 @@ def test_join():
     assert os.path.join('empty') == path.Path('empty').join()
 
 
+def _slow_div(a, b):
+    # Path.__div__ without the fast path
+    return os.path.normcase(os.path.normpath(
+        os.path.join(a, b) if a and b else ''
+    ))
+
+
+def test_div_equivalence():
+    parts = ['', '/', '.', '..', 'a', 'b/', '/c', 'a//b', '.d', 'e/.f',
+             'g/./h', 'i/../j', 'k/..', './l', '//m', 'n/', 'A.TXT', '...']
+    for a in parts:
+        assert path.Path(a) == os.path.normcase(a)
+        assert type(path.Path(a)) is path.Path
+        for b in parts:
+            expected = _slow_div(a, b)
+            for x, y in [(a, b), (path.Path(a), b), (a, path.Path(b)),
+                         (path.Path(a), path.Path(b))]:
+                res = path.Path(x) / y
+                assert type(res) is path.Path
+                assert res == expected, (x, y)
+            # joining onto a joined (normalized) path
+            assert path.Path(a) / b / 'x' == _slow_div(expected, 'x')
+
+
+def test_div_equivalence_random():
+    rnd = random.Random(42)
+    segments = ['', '.', '..', 'a', 'bc', '.d', 'E', 'f.g', '...']
+    for _ in range(5000):
+        a, b = ['/' * rnd.randint(0, 1) + '/'.join(
+            rnd.choice(segments) for _ in range(rnd.randint(0, 4))
+        ) + '/' * rnd.randint(0, 1) for _ in range(2)]
+        assert path.Path(a) / b == _slow_div(a, b), (a, b)
+
+
 def test_lexists():
     assert os.path.lexists('empty') == path.Path('empty').lexists()
 
@@ -662,3 +706,139 @@ def test_cd_contextmanager():
         with cd('a'):
             assert 'b' in os.listdir('.')
         assert 'a' in os.listdir('.')
+
+
+def test_glob_literal_prefix():
+    files = """
+        - static:
+            - css:
+                - a.css
+                - b.js
+            - js:
+                - c.css
+        - d.css
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        assert [p.relpath(root) for p in root.glob('static/css/*.css')] == [
+            opjoin('static', 'css', 'a.css')
+        ]
+        assert root.glob('static/css') == []
+        assert root.glob('nothing/here/*.css') == []
+
+
+def test_iglob():
+    files = """
+        - a.py
+        - b:
+            - c.py
+            - d.txt
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        it = root.iglob('**/*.py')
+        assert not isinstance(it, list)
+        assert list(it) == root.glob('**/*.py')
+        assert root.glob_exists('**/*.txt')
+        assert not root.glob_exists('**/*.js')
+        assert root.first_match('**/*.py') == root / 'a.py'
+        assert root.first_match('b/*') == root / 'b' / 'c.py'
+        assert root.first_match('**/*.js') is None
+
+
+def test_contains_names():
+    files = """
+        - a
+        - b:
+            - c
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        assert 'b' in root
+        assert '' not in root
+        assert '.' not in root
+        assert '..' not in root
+        assert opjoin('b', 'c') not in root
+        assert 'c' in root / 'b'
+        with cd(_root):
+            # a file (the temp dir name could contain any name)
+            assert 'zz' not in path.Path('b') / 'c'
+        assert 'b' in path.Path('abc')
+        with cd(_root):
+            assert 'b' not in path.Path('')
+
+
+def test_contains_path_item():
+    files = """
+        - d:
+            - sub:
+                - x
+        - sub:
+            - x:
+                - y
+    """
+    with create_files(files) as _root:
+        with cd(_root):
+            d = path.Path('d')
+            assert 'sub' in d
+            assert path.Path('sub') in d
+            assert opjoin('sub', 'x') not in d
+            assert path.Path(opjoin('sub', 'x')) not in d
+
+
+def test_scandir(monkeypatch):
+    files = """
+        - a.txt: hello
+        - b:
+            - c
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        entries = sorted(root.scandir(stat=True))
+        assert [e.relpath(root) for e in entries] == ['a.txt', 'b']
+        a, b = entries
+        assert isinstance(a, path.Path)
+        assert a == root / 'a.txt'
+        assert a.name == 'a.txt'
+        assert a.is_file() and not a.is_dir()
+        assert b.is_dir() and not b.is_symlink()
+        assert a.size == 5
+        assert a.mtime == a.getmtime()
+
+        monkeypatch.setattr(os, 'stat', None)
+        assert [d.relpath(root) for d in root.subdirs()] == ['b']
+        assert [d.relpath(root) for d in root.files()] == ['a.txt']
+
+
+def test_listing_copy_pickle():
+    files = """
+        - a.txt: hello
+        - b:
+            - c
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        for res in (root.files(), root.subdirs(), root.list()):
+            for p in res:
+                assert type(p) is path.Path
+                assert pickle.loads(pickle.dumps(p)) == p
+                assert copy.copy(p) == p
+                assert copy.deepcopy(p) == p
+        entry = next(root.scandir())
+        assert type(pickle.loads(pickle.dumps(entry))) is path.Path
+        assert copy.copy(entry) == entry
+
+
+@pytest.mark.skipif(not hasattr(os, 'symlink') or sys.platform == 'win32',
+                    reason="needs symlinks")
+def test_scandir_dangling_symlink():
+    files = """
+        - a.txt: hello
+    """
+    with create_files(files) as _root:
+        root = path.Path(_root)
+        os.symlink(os.path.join(_root, 'missing'), os.path.join(_root, 'l'))
+        entries = sorted(root.scandir(stat=True))
+        assert [e.name for e in entries] == ['a.txt', 'l']
+        assert entries[1].is_symlink()
+        assert entries[1].size == os.lstat(entries[1]).st_size
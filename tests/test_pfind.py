@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
 import os
+import time
 from yamldirs import create_files
 from dkfileutils import pfind
 from dkfileutils.path import Path
@@ -43,3 +44,79 @@ def test_pfindall():
             'a2.txt': root / 'a/a1/a2.txt',
             'a1.txt': root / 'a/a1.txt',
         }
+
+
+def test_pfind_cache(monkeypatch):
+    files = """
+        a:
+            - a1.txt
+            - b: []
+    """
+    with create_files(files) as root:
+        root = Path(root)
+        past = time.time() - 60
+        for d in [root, root / 'a', root / 'a/b']:
+            os.utime(d, (past, past))
+        pfind.clear_cache()
+
+        probes = []
+        lexists = os.path.lexists
+
+        def tracking_lexists(p):
+            probes.append(p)
+            return lexists(p)
+
+        monkeypatch.setattr(os.path, 'lexists', tracking_lexists)
+        assert pfind.pfind('a/b', 'a1.txt') == root / 'a/a1.txt'
+        assert len(probes) == 2
+
+        del probes[:]
+        assert pfind.pfind('a/b', 'a1.txt') == root / 'a/a1.txt'
+        assert pfind.pfind('a', 'a1.txt') == root / 'a/a1.txt'
+        assert probes == []
+
+        # adding a file changes the directory's mtime
+        (root / 'a/b/a1.txt').write('hello')
+        assert pfind.pfind('a/b', 'a1.txt') == root / 'a/b/a1.txt'
+        (root / 'a/b/a1.txt').unlink()
+        assert pfind.pfind('a/b', 'a1.txt') == root / 'a/a1.txt'
+        pfind.clear_cache()
+
+
+def test_pfind_many(monkeypatch):
+    files = """
+        a:
+            - setup.py
+            - b:
+                - c:
+                    - x.txt
+                - d:
+                    - setup.py
+                    - y.txt
+            - e: []
+    """
+    with create_files(files) as root:
+        root = Path(root)
+        pfind.clear_cache()
+        looked = []
+        present = pfind._present
+
+        def tracking_present(d, fnames):
+            looked.append(d)
+            return present(d, fnames)
+
+        monkeypatch.setattr(pfind, '_present', tracking_present)
+        paths = ['a/b/c/x.txt', 'a/b/c', 'a/b/d/y.txt', 'a/e', 'a']
+        assert pfind.pfind_many(paths, 'setup.py') == {
+            'a/b/c/x.txt': root / 'a/setup.py',
+            'a/b/c': root / 'a/setup.py',
+            'a/b/d/y.txt': root / 'a/b/d/setup.py',
+            'a/e': root / 'a/setup.py',
+            'a': root / 'a/setup.py',
+        }
+        assert len(looked) == len(set(looked))
+        for p in paths:
+            assert pfind.pfind_many([p], 'setup.py')[p] == pfind.pfind(
+                os.path.dirname(p) if p.endswith('.txt') else p, 'setup.py'
+            )
+        assert pfind.pfind_many(['a'], 'missing.txt') == {'a': None}
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import pstats
+
+from yamldirs import create_files
+
+from dkfileutils import profiling
+from dkfileutils.changed import changed
+from dkfileutils.listfiles import list_files
+from dkfileutils.profiling import profile_env, profiled
+
+
+def test_profiled_pstats():
+    with create_files("- a.py: hello") as root:
+        fname = os.path.join(root, 'out.prof')
+        with profiled(fname) as profiler:
+            assert profiler is not None
+            list(list_files(root))
+        st = pstats.Stats(fname)
+        assert any(func[2] == 'list_files' for func in st.stats)
+
+
+def test_profiled_report(capsys):
+    with create_files("- a.py: hello") as root:
+        fname = os.path.join(root, 'report.txt')
+        with profiled(fname):
+            list(list_files(root))
+        with open(fname) as fp:
+            assert 'list_files' in fp.read()
+
+        with profiled('-'):
+            list(list_files(root))
+        assert 'cumulative' in capsys.readouterr().err
+
+
+def test_profiled_nested():
+    with profiled(None) as profiler:
+        assert profiler is None
+    with profiled(os.devnull) as outer:
+        with profiled(os.devnull) as inner:
+            assert outer is not None
+            assert inner is None
+    assert not profiling._active
+
+
+def test_profile_env(monkeypatch):
+    with create_files("- a.py: hello") as root:
+        fname = os.path.join(root, 'env.prof')
+        monkeypatch.setenv(profiling.PROFILE_ENV, fname)
+        assert changed(root, filename='.cache')
+        st = pstats.Stats(fname)
+        names = {func[2] for func in st.stats}
+        assert 'changed' in names
+        assert 'list_files' in names    # part of the outer profile
+
+        os.unlink(fname)
+        assert [f for _, f in list_files(root)] == ['a.py']
+        assert os.path.exists(fname)
+
+        monkeypatch.delenv(profiling.PROFILE_ENV)
+        os.unlink(fname)
+        list(list_files(root))
+        assert not os.path.exists(fname)
+
+
+def test_profile_env_keeps_signature():
+    @profile_env
+    def f(x):
+        """doc"""
+        return x + 1
+    assert f(1) == 2
+    assert f.__doc__ == 'doc'
+    assert f.__name__ == 'f'
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import threading
+
+import pytest
+from yamldirs import create_files
+
+import dkfileutils
+from dkfileutils import statcache
+from dkfileutils.path import Path
+
+
+def _count_stats(monkeypatch):
+    calls = []
+    stat = os.stat
+
+    def counting_stat(p, *args, **kw):
+        calls.append(p)
+        return stat(p, *args, **kw)
+
+    monkeypatch.setattr(os, 'stat', counting_stat)
+    return calls
+
+
+def test_fscache_memoizes(monkeypatch):
+    files = """
+        - a.txt: hello
+        - b: []
+    """
+    with create_files(files) as _root:
+        root = Path(_root)
+        a = root / 'a.txt'
+        calls = _count_stats(monkeypatch)
+        with dkfileutils.fscache():
+            assert a.isfile()
+            assert not a.isdir()
+            assert a.exists()
+            assert a.getsize() == 5
+            a.getmtime()
+            assert len(calls) == 1
+            assert sorted(p.relpath(root) for p in root.subdirs()) == ['b']
+            assert sorted(p.relpath(root) for p in root.files()) == ['a.txt']
+            assert 'a.txt' in root
+            assert len(calls) == 1    # the listing knows the file types
+            assert not (root / 'missing').exists()
+            assert not (root / 'missing').exists()
+            assert len(calls) == 2
+            with pytest.raises(OSError):
+                (root / 'missing').getsize()
+
+        del calls[:]
+        assert a.isfile()
+        assert a.isfile()
+        assert len(calls) == 2
+
+
+def test_fscache_invalidation():
+    files = """
+        - a.txt: hello
+    """
+    with create_files(files) as _root:
+        root = Path(_root)
+        a = root / 'a.txt'
+        with dkfileutils.fscache():
+            assert a.getsize() == 5
+            assert not (root / 'b.txt').exists()
+            assert [p.relpath(root) for p in root.listdir()] == ['a.txt']
+
+            a.write('hello world')
+            assert a.getsize() == 11
+            (root / 'b.txt').touch()
+            assert (root / 'b.txt').exists()
+            assert sorted(root.listdir()) == ['a.txt', 'b.txt']
+
+            a.unlink()
+            assert not a.exists()
+            d = root.makedirs('x/y')
+            assert d.isdir()
+            assert (root / 'x').isdir()
+            root.rmtree('x')
+            assert not d.exists()
+            assert not (root / 'x').exists()
+
+            # changes made behind our back need explicit invalidation
+            os.mkdir(os.path.join(root, 'x'))
+            assert not (root / 'x').exists()
+            statcache.invalidate(root / 'x')
+            assert (root / 'x').isdir()
+
+
+def test_fscache_nested():
+    files = """
+        - a.txt: hello
+    """
+    with create_files(files) as _root:
+        a = Path(_root) / 'a.txt'
+        with dkfileutils.fscache() as outer:
+            assert a.getsize() == 5
+            with dkfileutils.fscache() as inner:
+                assert inner is not outer
+                a.write('hi')
+                assert a.getsize() == 2
+            assert a.getsize() == 2
+        assert statcache._local.active == []
+
+
+def test_fscache_thread_local():
+    files = """
+        - a.txt: hello
+    """
+    with create_files(files) as _root:
+        b = Path(_root) / 'b.txt'
+        entered = threading.Event()
+        done = threading.Event()
+        res = {}
+
+        def holder():
+            with dkfileutils.fscache():
+                res['before'] = b.exists()
+                entered.set()
+                done.wait(5)
+                res['after'] = b.exists()   # cached
+
+        t = threading.Thread(target=holder)
+        t.start()
+        entered.wait(5)
+        b.write('world')
+        res['other'] = b.exists()
+        done.set()
+        t.join()
+        assert res == {'before': False, 'other': True, 'after': False}
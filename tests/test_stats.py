@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import json
+
+from yamldirs import create_files
+
+from dkfileutils.changed import changed, digest
+from dkfileutils.listfiles import list_files
+from dkfileutils.path import Path
+from dkfileutils.stats import Stats
+
+FILES = """
+    - a.py: hello
+    - b.txt: skipped
+    - .hidden: skipped
+    - node_modules:
+        - c.js: skipped
+    - d:
+        - e.py: world
+"""
+
+
+def test_list_files_stats():
+    with create_files(FILES) as root:
+        stats = Stats()
+        res = list(list_files(root, stats=stats))
+        assert len(res) == 2
+        assert stats.dirs == 2
+        assert stats.entries == 6
+        assert stats.skipped == {'skipexts': 1, 'dotfile': 1, 'skipdirs': 1}
+        assert stats.files_opened == 2
+        assert stats.bytes_hashed == 10
+        assert set(stats.phases) == {'scandir', 'hash'}
+
+
+def test_digest_stats():
+    with create_files(FILES) as root:
+        stats = Stats()
+        digest(root, stats=stats)
+        assert stats.files_opened == 2
+        assert stats.bytes_hashed == 10
+        assert {'walk', 'hash'} <= set(stats.phases)
+
+        stats = Stats()
+        digest(root, stats=stats, workers=2)
+        assert stats.files_opened == 2
+        assert stats.bytes_hashed == 10
+
+
+def test_changed_stats():
+    with create_files(FILES) as root:
+        stats = Stats()
+        assert changed(root, stats=stats)
+        assert stats.stat_calls == 2
+        assert stats.files_opened == 2
+
+        stats = Stats()
+        assert not changed(root, stats=stats)
+        assert stats.stat_calls == 2
+        assert stats.files_opened <= 2   # files younger than the manifest
+
+
+def test_glob_stats():
+    with create_files(FILES) as root:
+        stats = Stats()
+        assert len(Path(root).glob('**/*.py', stats=stats)) == 2
+        assert stats.dirs == 3
+        assert stats.skipped['dotfile'] == 1
+
+        stats = Stats()
+        assert len(Path(root).glob('d/e.py', stats=stats)) == 1
+        assert stats.dirs == 0
+        assert stats.stat_calls == 2
+
+
+def test_report():
+    stats = Stats()
+    stats.add(dirs=2, bytes_hashed=10)
+    stats.skip('dotfile')
+    with stats.phase('walk'):
+        pass
+    assert 'dirs:' in str(stats)
+    assert 'skipped dotfile:' in stats.report()
+    data = json.loads(json.dumps(stats.as_dict()))
+    assert data['dirs'] == 2
+    assert data['skipped'] == {'dotfile': 1}
+    assert 'walk' in data['phases']
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import os
+import threading
+import time
+
+from yamldirs import create_files
+
+from dkfileutils.listfiles import list_files
+from dkfileutils.path import Path
+from dkfileutils.walker import listdir, walk
+
+FILES = """
+    - a.py
+    - .hidden.py
+    - b:
+        - c.py
+        - d:
+            - e.py
+        - f.txt
+    - g:
+        - h.py
+        - .i:
+            - j.py
+    - k:
+        - l:
+            - m:
+                - n.py
+"""
+
+
+def _visit(_path, prefix, entries):
+    files = []
+    subdirs = []
+    for entry in sorted(entries or (), key=lambda e: e.name):
+        if entry.is_dir():
+            subdirs.append((entry.path, prefix + entry.name + '/'))
+        else:
+            files.append(prefix + entry.name)
+    return files, subdirs
+
+
+def test_walk_order():
+    with create_files(FILES) as root:
+        serial = list(walk(root, listdir, _visit, ''))
+        assert serial == [
+            '.hidden.py', 'a.py', 'b/c.py', 'b/f.txt', 'b/d/e.py',
+            'g/h.py', 'g/.i/j.py', 'k/l/m/n.py',
+        ]
+        for workers in (2, 3, 8):
+            assert list(walk(root, listdir, _visit, '', workers)) == serial
+        assert list(walk(os.path.join(root, 'missing'), listdir, _visit,
+                         '', 4)) == []
+
+
+def test_walk_concurrent():
+    files = "\n".join("- d%d:\n    - f.py" % i for i in range(8))
+    with create_files(files) as root:
+        lock = threading.Lock()
+        active = [0]
+        peak = [0]
+
+        def slow_listdir(path, data):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return listdir(path)
+
+        res = list(walk(root, slow_listdir, _visit, '', workers=4))
+        assert len(res) == 8
+        assert peak[0] > 1
+
+
+def test_parallel_users():
+    with create_files(FILES) as root:
+        assert list(list_files(root, workers=4)) == list(list_files(root))
+        assert list(list_files(root, digest=False, workers=4)) == \
+            list(list_files(root, digest=False))
+
+        p = Path(root)
+        assert list(p.iterfiles(workers=4)) == list(p)
+        assert sorted(f.relpath(p) for f in p) == sorted([
+            'a.py', os.path.join('b', 'c.py'), os.path.join('b', 'f.txt'),
+            os.path.join('b', 'd', 'e.py'), os.path.join('g', 'h.py'),
+            os.path.join('k', 'l', 'm', 'n.py'),
+        ])
+        assert p.glob('**/*.py', workers=4) == p.glob('**/*.py')
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from __future__ import print_function
+import ctypes
+import errno
+import os
+import shutil
+import sys
+
+import pytest
+from yamldirs import create_files
+
+from dkfileutils.changed import Directory, digest
+from dkfileutils import watch
+from dkfileutils.watch import Watcher
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith('linux'), reason="inotify is Linux only"
+)
+
+
+def _write(fname, txt):
+    with open(fname, 'w') as fp:
+        fp.write(txt)
+
+
+def test_watch():
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: world
+            - node_modules:
+                - e: skipped
+    """
+    with create_files(files) as _root:
+        with Directory('a').watch(latency=0.01) as w:
+            assert sorted(w.manifest.files) == ['b', 'c/d']
+            assert w.digest() == digest('a', merkle=True)
+            assert not w.poll()
+
+            _write('a/c/d', 'there')
+            _write('a/f', 'new')
+            _write('a/node_modules/e', 'still skipped')
+            os.unlink('a/b')
+            changes = w.poll(1)
+            assert changes.added == ['f']
+            assert changes.removed == ['b']
+            assert changes.modified == ['c/d']
+            assert w.digest() == digest('a', merkle=True)
+
+
+def test_watch_dirs():
+    files = """
+        a:
+            - b:
+                - c: hello
+            - x:
+                - y: world
+    """
+    with create_files(files) as _root:
+        with Watcher('a', latency=0.01) as w:
+            os.makedirs('a/d/e')
+            _write('a/d/e/f', 'new')
+            assert w.poll(1).added == ['d/e/f']
+
+            shutil.rmtree('a/b')
+            assert w.poll(1).removed == ['b/c']
+
+            os.rename('a/x', 'a/z')
+            changes = w.poll(1)
+            assert changes.added == ['z/y']
+            assert changes.removed == ['x/y']
+
+            _write('a/z/y', 'moved and changed')
+            assert w.poll(1).modified == ['z/y']
+            assert w.digest() == digest('a', merkle=True)
+            assert sorted(w.manifest.files) == ['d/e/f', 'z/y']
+
+
+def test_watch_glob():
+    files = """
+        a:
+            - b.js: hello
+            - c.css: world
+    """
+    with create_files(files) as _root:
+        with Directory('a').watch(glob='**/*.js', latency=0.01) as w:
+            _write('a/c.css', 'ignored')
+            assert not w.poll(0.2)
+            _write('a/d.js', 'new')
+            assert list(w.batches(timeout=1)) == [(['d.js'], [], [])]
+
+
+
+class _FailingLibc:
+    """The C library, but ``inotify_add_watch`` fails with `err` for
+       directories named `name`.
+    """
+    def __init__(self, libc, name, err):
+        self._libc = libc
+        self.name = name
+        self.err = err
+
+    def __getattr__(self, attr):
+        return getattr(self._libc, attr)
+
+    def inotify_add_watch(self, fd, path, mask):
+        if os.path.basename(path) == self.name:
+            ctypes.set_errno(self.err)
+            return -1
+        return self._libc.inotify_add_watch(fd, path, mask)
+
+
+def test_watch_errors(monkeypatch):
+    files = """
+        a:
+            - b: hello
+            - c:
+                - d: world
+    """
+    libc = watch._inotify()
+    with create_files(files) as _root:
+        monkeypatch.setattr(watch, '_inotify',
+                            lambda: _FailingLibc(libc, b'c', errno.ENOENT))
+        with Watcher('a') as w:   # c was removed before it was watched
+            assert sorted(w.manifest.files) == ['b']
+
+        monkeypatch.setattr(watch, '_inotify',
+                            lambda: _FailingLibc(libc, b'c', errno.ENOSPC))
+        with pytest.raises(OSError) as e:
+            Watcher('a')
+        assert e.value.errno == errno.ENOSPC
@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import print_function
+import os
+import sys
+
 import pytest
+from yamldirs import create_files
 
 from dkfileutils import which
 
@@ -21,3 +25,96 @@ def test_missing_executable():
 def test_incorrect_extension():
     with pytest.raises(ValueError):
         which.get_executable('foo.bar')
+
+
+def _make_exe(fname):
+    with open(fname, 'w') as fp:
+        fp.write('#!/bin/sh\n')
+    os.chmod(fname, 0o755)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="posix executables")
+def test_which_probes(monkeypatch):
+    files = """
+        - bin1:
+            - tool: []
+        - bin2:
+            - tool: ''
+        - bin3: []
+    """
+    with create_files(files) as root:
+        bins = [os.path.join(root, d) for d in ('bin1', 'bin2', 'bin3')]
+        os.chmod(os.path.join(bins[1], 'tool'), 0o644)
+        _make_exe(os.path.join(bins[2], 'tool'))
+        monkeypatch.setenv('PATH', os.pathsep.join(bins))
+        monkeypatch.setattr(os, 'listdir', None)
+        # directories and non-executable files are skipped
+        assert list(which.which('tool')) == [os.path.join(bins[2], 'tool')]
+        assert which.get_executable('nothere') is None
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="posix executables")
+def test_path_index(monkeypatch):
+    files = """
+        - bin1: []
+        - bin2: []
+    """
+    with create_files(files) as root:
+        bin1 = os.path.join(root, 'bin1')
+        bin2 = os.path.join(root, 'bin2')
+        _make_exe(os.path.join(bin2, 'tool'))
+        monkeypatch.setenv('PATH', os.pathsep.join([bin1, bin2]))
+        monkeypatch.delenv(which.CACHE_ENV, raising=False)
+        which.clear_cache()
+
+        listed = []
+        listdir = os.listdir
+
+        def tracking_listdir(pth):
+            listed.append(pth)
+            return listdir(pth)
+
+        monkeypatch.setattr(os, 'listdir', tracking_listdir)
+        assert which.path_index(['']).lookup('tool') == [
+            os.path.join(bin2, 'tool')
+        ]
+        assert sorted(listed) == [bin1, bin2]
+
+        del listed[:]
+        assert which.path_index(['']).lookup('tool') == [
+            os.path.join(bin2, 'tool')
+        ]
+        assert listed == []
+
+        _make_exe(os.path.join(bin1, 'tool'))
+        os.utime(bin1, ns=(0, os.stat(bin1).st_mtime_ns + 10**9))
+        assert which.path_index(['']).lookup('tool') == [
+            os.path.join(bin1, 'tool'), os.path.join(bin2, 'tool')
+        ]
+        assert listed == [bin1]
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="posix executables")
+def test_path_index_persisted(monkeypatch):
+    files = """
+        - bin: []
+    """
+    with create_files(files) as root:
+        bindir = os.path.join(root, 'bin')
+        _make_exe(os.path.join(bindir, 'tool'))
+        cachefile = os.path.join(root, 'which.json')
+        monkeypatch.setenv('PATH', bindir)
+        monkeypatch.setenv(which.CACHE_ENV, cachefile)
+        which.clear_cache()
+        assert which.path_index(['']).lookup('tool') == [
+            os.path.join(bindir, 'tool')
+        ]
+        assert os.path.exists(cachefile)
+
+        # a new process only needs to stat the path directories
+        which.clear_cache()
+        monkeypatch.setattr(os, 'listdir', None)
+        assert which.path_index(['']).lookup('tool') == [
+            os.path.join(bindir, 'tool')
+        ]
+        which.clear_cache()